@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Set
+
+from llama_vision import MODEL, VisionClient, aanalyze_image, get_cache
+from llama_vision.client import BASE_URL, RATE_LIMIT
+
+# Analyze a folder (or manifest) of images concurrently, appending one JSON line per image:
+#   python batch_analyze.py charts/ --prompt "Summarize this chart." --output results.jsonl
+#   python batch_analyze.py manifest.jsonl --schema schemas:FinancialChartAnalysis --concurrency 16
+# Rerunning with the same --output skips images that already succeeded. Against the mock server:
+#   python mock_openai_server.py --token-delay 0 &
+#   python batch_analyze.py charts/ --prompt "Describe" --base-url http://127.0.0.1:8001/v1
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.gif', '.bmp'}
+PROGRESS_EVERY = 50  # Print a progress line every N finished images
+
+def iter_directory(directory: str) -> Iterator[Dict]:
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                yield {'image': os.path.join(root, name)}
+
+def iter_manifest(path: str) -> Iterator[Dict]:
+    """Manifest lines are either an image path or URL, or a JSON object {"image": path or URL, "prompt": optional override}."""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            item = json.loads(line) if line.startswith('{') else {'image': line}
+            if not item['image'].startswith(('http://', 'https://', 'data:')):
+                item['image'] = os.path.join(base, item['image'])  # Relative paths are relative to the manifest
+            yield item
+
+def load_items(source: str) -> List[Dict]:
+    return list(iter_directory(source) if os.path.isdir(source) else iter_manifest(source))
+
+def load_schema(spec: str):
+    """Import a pydantic model given as 'module:ClassName'."""
+    module_name, _, class_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+def completed_images(output: str) -> Set[str]:
+    """Images already analyzed successfully in an earlier run; a line cut off by a crash is ignored."""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('ok'):
+                done.add(record['image'])
+    return done
+
+class BatchRunner:
+    """Runs one request per image, at most `concurrency` at a time, appending results as they finish.
+
+    The client paces and retries the requests; the semaphore here also bounds how many encoded
+    images are held in memory.
+    """
+
+    def __init__(self, client: VisionClient, model: str = MODEL, concurrency: int = 8, schema=None, max_tokens: Optional[int] = None,
+                 use_cache: bool = True):
+        self.client = client
+        self.use_cache = use_cache
+        self.model = model
+        self.schema = schema
+        self.max_tokens = max_tokens
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.succeeded = 0
+        self.failed = 0
+
+    async def analyze(self, item: Dict, default_prompt: str) -> Dict:
+        start = time.perf_counter()
+        record = {'image': item['image']}
+        async with self.semaphore:
+            try:
+                # The image is only read and encoded (off the event loop) once a slot is free
+                options = {'max_tokens': self.max_tokens} if self.max_tokens else {}
+                result = await aanalyze_image(item['image'], item.get('prompt') or default_prompt,
+                                              response_model=self.schema, model=self.model, client=self.client,
+                                              use_cache=self.use_cache, **options)
+                record['response'] = result.model_dump(mode='json') if self.schema is not None else result
+                record['ok'] = True
+            except Exception as e:
+                record['ok'] = False
+                record['error'] = f"{type(e).__name__}: {e}"
+        record['elapsed'] = round(time.perf_counter() - start, 3)
+        return record
+
+    async def run(self, items: List[Dict], prompt: str, output: str):
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(self.analyze(item, prompt)) for item in items]
+        with open(output, 'a') as f:
+            for finished, task in enumerate(asyncio.as_completed(tasks), start=1):
+                record = await task
+                f.write(json.dumps(record) + "\n")
+                f.flush()  # Each finished image survives a crash
+                if record['ok']:
+                    self.succeeded += 1
+                else:
+                    self.failed += 1
+                if finished % PROGRESS_EVERY == 0 or finished == len(tasks):
+                    rate = finished / (time.perf_counter() - started)
+                    print(f"{finished}/{len(tasks)} done ({self.failed} failed), {rate:.1f} images/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a directory or manifest of images with the vision model.")
+    parser.add_argument('source', help="Directory of images, or a manifest with one path or JSON object per line")
+    parser.add_argument('--prompt', default="Describe this image.")
+    parser.add_argument('--schema', help="Pydantic model for structured output, as module:ClassName")
+    parser.add_argument('--output', default='results.jsonl')
+    parser.add_argument('--concurrency', type=int, default=8, help="Requests in flight at once")
+    parser.add_argument('--model', default=MODEL)
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--rate', type=float, default=RATE_LIMIT, help="Starting requests per second; adapts to 429s and rate-limit headers")
+    parser.add_argument('--timeout', type=float, default=120, help="Deadline per image in seconds, retries included")
+    parser.add_argument('--max-tokens', type=int)
+    parser.add_argument('--no-cache', action='store_true', help="Always call the model, ignoring and not storing cached replies")
+    args = parser.parse_args()
+
+    schema = load_schema(args.schema) if args.schema else None
+    done = completed_images(args.output)
+    items = [item for item in load_items(args.source) if item['image'] not in done]
+    print(f"{len(items)} image(s) to analyze, {len(done)} already done")
+    if not items:
+        return
+
+    client = VisionClient(base_url=args.base_url, api_key=os.getenv("FIREWORKS_API_KEY") or "unused",
+                          rate=args.rate, max_concurrency=args.concurrency, timeout=args.timeout)
+    runner = BatchRunner(client, args.model, args.concurrency, schema, args.max_tokens, use_cache=not args.no_cache)
+    asyncio.run(runner.run(items, args.prompt, args.output))
+    print(f"Finished: {runner.succeeded} succeeded, {runner.failed} failed. Rerun to retry failures.")
+    print(f"Client: {client.stats.snapshot()}")
+    if not args.no_cache and get_cache() is not None:
+        print(f"Cache: {get_cache().stats()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from chunking import chunk_spans, split_text
+from corpus import Corpus, Segment, make_vectorizer
+from embeddings import HashingEmbedder, vector_scale
+from ingest import process_dataframe
+from retrieval import HYBRID_DEPTH, fuse_rankings, top_k_indices
+
+def process_dataframe_iterrows(df: pd.DataFrame) -> str:
+    """Original row-by-row serializer, kept as the reference for process_dataframe."""
+    df = df.dropna(how='all', axis=1).dropna(how='all', axis=0)
+    text_chunks = ["Columns: " + ", ".join(df.columns.astype(str))]
+    for idx, row in df.iterrows():
+        row_text = f"Entry {idx + 1}:\n"
+        for col in df.columns:
+            value = row[col]
+            if pd.notna(value):
+                row_text += f"{col}: {value}\n"
+        text_chunks.append(row_text)
+    return "\n\n".join(text_chunks)
+
+def synthetic_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Mixed-type frame shaped like a sales export, with scattered nulls."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Date': pd.date_range('2020-01-01', periods=rows, freq='h'),
+        'Region': rng.choice(['North', 'South', 'East', 'West'], rows),
+        'Product': rng.choice([f"SKU-{i}" for i in range(500)], rows),
+        'Units': rng.integers(0, 1000, rows),
+        'Revenue': rng.normal(5000, 1500, rows).round(2),
+        'Notes': rng.choice(['', 'promo', 'returned', None], rows),
+    })
+    df.loc[rng.random(rows) < 0.05, 'Revenue'] = np.nan
+    return df
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def bench_dataframe(sizes):
+    print(f"{'rows':>10} {'iterrows (s)':>14} {'vectorized (s)':>16} {'speedup':>9}")
+    for rows in sizes:
+        df = synthetic_frame(rows)
+        expected, legacy = timed(process_dataframe_iterrows, df)
+        actual, vectorized = timed(process_dataframe, df)
+        assert actual == expected, "vectorized output differs from iterrows output"
+        print(f"{rows:>10} {legacy:>14.3f} {vectorized:>16.3f} {legacy / vectorized:>8.1f}x")
+
+def synthetic_text(megabytes: int, seed: int = 0) -> str:
+    """Paragraphs of random words, roughly the given size, built by tiling a 1 MB block."""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(["revenue", "policy", "quarter", "claim", "the", "of", "customer", "refund", "2024", "$927K"])
+    paragraphs = []
+    size = 0
+    while size < 1_000_000:
+        lines = [" ".join(rng.choice(vocabulary, rng.integers(3, 20))) for _ in range(rng.integers(1, 8))]
+        paragraphs.append("\n".join(lines))
+        size += len(paragraphs[-1]) + 2
+    block = "\n\n".join(paragraphs)
+    return "\n\n".join([block] * megabytes)
+
+def bench_chunking(sizes):
+    print(f"{'MB':>6} {'mode':>9} {'chunks':>10} {'time (s)':>10} {'MB/s':>8}")
+    for megabytes in sizes:
+        text = synthetic_text(megabytes)
+        for mode in ('sections', 'words'):
+            spans, elapsed = timed(lambda: sum(1 for _ in chunk_spans(text, 1000, 100, mode)))
+            print(f"{megabytes:>6} {mode:>9} {spans:>10} {elapsed:>10.2f} {len(text) / 1e6 / elapsed:>8.1f}")
+
+def known_item_queries(chunks, count: int, words: int = 4, seed: int = 0):
+    """(query, source chunk) pairs: a few words sampled from a random chunk, which should rank it first."""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for row in rng.choice(len(chunks), count):
+        tokens = chunks[row].split()
+        queries.append((" ".join(rng.choice(tokens, min(words, len(tokens)), replace=False)), row))
+    return queries
+
+def brute_force_dense(corpus: Corpus, segment: Segment, query: str, depth: int):
+    """(rows, scores) of the depth best chunks by cosine similarity, scanning every stored vector."""
+    query_vector = corpus.embedder.embed([query])[0]
+    scores = segment.vectors.astype(np.float32) @ query_vector / vector_scale(segment.vectors)
+    rows = top_k_indices(scores, depth)
+    return rows, scores[rows]
+
+def exact_top_scores(corpus: Corpus, segment: Segment, query: str, top_k: int) -> np.ndarray:
+    """The top_k scores an exhaustive search would return, to check pruned or approximate results against."""
+    retriever = corpus._current_view()[0]
+    if corpus.retriever == 'dense':
+        return brute_force_dense(corpus, segment, query, top_k)[1]
+    if corpus.retriever == 'hybrid':
+        # The sparse side is exact already; only the IVF dense side needs replacing by a full scan
+        depth = max(top_k, HYBRID_DEPTH)
+        ranked = [retriever.sparse.search(query, depth)[0], brute_force_dense(corpus, segment, query, depth)[0]]
+        return fuse_rankings(ranked, top_k)[1]
+    # Asking for every chunk disables BM25's pruning; TF-IDF always scores every chunk
+    return retriever.search(query, len(segment))[1][:top_k]
+
+def same_scores(found, expected) -> bool:
+    return len(found) == len(expected) and np.allclose(found, expected, rtol=1e-5, atol=1e-6)
+
+def bench_retrieval(sizes, top_k: int = 3, query_count: int = 200):
+    print(f"{'rows':>10} {'chunks':>8} {'retriever':>10} {'build (s)':>10} {'query (ms)':>11} "
+          f"{'recall@' + str(top_k):>9} {'exact':>7}")
+    vectorizer = make_vectorizer(stop_words='english', token_pattern=r'(?u)\b\w+\b', ngram_range=(1, 2))
+    for rows in sizes:
+        chunks = split_text(process_dataframe(synthetic_frame(rows)), 1000, 100)
+        embedder = HashingEmbedder()
+        segment = Segment.build('bench', chunks, vectorizer, embedder)
+        queries = known_item_queries(chunks, query_count)
+        for name in ('tfidf', 'bm25', 'dense', 'hybrid'):
+            corpus = Corpus(vectorizer, retriever=name, embedder=embedder)
+            corpus.add(segment)
+            _, build = timed(corpus.search, "", 1)  # The first search builds the index
+            start = time.perf_counter()
+            results = [corpus.search(query, top_k) for query, _ in queries]
+            latency = (time.perf_counter() - start) / len(queries) * 1000
+            recall = np.mean([source in [i for _, i, _ in found] for found, (_, source) in zip(results, queries)])
+            # Scores rather than ids, since tied chunks may come back in either order
+            exact = np.mean([
+                same_scores([score for _, _, score in found], exact_top_scores(corpus, segment, query, top_k))
+                for found, (query, _) in zip(results, queries)
+            ])
+            print(f"{rows:>10} {len(chunks):>8} {name:>10} {build:>10.2f} {latency:>11.2f} {recall:>9.3f} {exact:>7.3f}")
+
+ENCODER_CONFIGS = [('png', None), ('jpeg', 95), ('jpeg', 85), ('jpeg', 70), ('webp', 80)]
+
+def bench_image_encoding(max_sides, image_path: str, base_url=None, repeats: int = 20):
+    """Encode time and payload size per format/quality/size; with base_url, also request latency."""
+    import cv2
+    from llama_vision import ImageEncoder, VisionClient, analyze_image
+
+    frame = cv2.imread(image_path)
+    if frame is None:
+        raise SystemExit(f"Could not read image {image_path}")
+    client = VisionClient(base_url=base_url, api_key="unused", rate=1000) if base_url else None
+    print(f"Source: {image_path} {frame.shape[1]}x{frame.shape[0]}")
+    print(f"{'max side':>9} {'format':>7} {'quality':>8} {'encode (ms)':>12} {'payload (KB)':>13} {'latency (ms)':>13}")
+    for max_side in max_sides:
+        for image_format, quality in ENCODER_CONFIGS:
+            encoder = ImageEncoder(image_format, quality or 0, max_side)
+            start = time.perf_counter()
+            for _ in range(repeats):
+                url = encoder.data_url(frame)
+            encode_ms = (time.perf_counter() - start) / repeats * 1000
+            latency = ""
+            if client is not None:
+                # Uncached, or every call after the first would time a disk read instead of the model
+                _, elapsed = timed(lambda: [analyze_image(frame, "Describe this image.", client=client, encoder=encoder,
+                                                          use_cache=False)
+                                            for _ in range(3)])
+                latency = f"{elapsed / 3 * 1000:.0f}"
+            print(f"{max_side or 'full':>9} {image_format:>7} {quality or '-':>8} {encode_ms:>12.2f} "
+                  f"{len(url) / 1024:>13.0f} {latency:>13}")
+
+def bench_wakeword(fixtures: str, templates: str, chunk_ms: int = 20):
+    """Stream WAV fixtures (fixtures/positive/*.wav contain the wake word, fixtures/negative/*.wav do not)
+    through the detector in chunk_ms steps, reporting triggers, best match distance and speed."""
+    from wakeword import SAMPLE_RATE, WakeWordDetector, read_wav, template_paths
+
+    files = [(label, path) for label in ('positive', 'negative')
+             for path in template_paths(os.path.join(fixtures, label))]
+    if not files:
+        raise SystemExit(f"No WAV files under {fixtures}/positive or {fixtures}/negative")
+    detector = WakeWordDetector.from_directory(templates)
+    # Calibrated once, on the opening half second of the first fixture, as the app does at startup
+    detector.calibrate(read_wav(files[0][1])[:SAMPLE_RATE // 2])
+    chunk = SAMPLE_RATE * chunk_ms // 1000
+    print(f"{len(detector.templates)} template(s), threshold {detector.threshold:.3f}, noise floor {detector.noise_db:.1f} dB")
+    print(f"{'file':>30} {'label':>9} {'triggers':>9} {'first (s)':>10} {'best':>7} {'x realtime':>11}")
+    audio_seconds = {'positive': 0.0, 'negative': 0.0}
+    detected, false_triggers, processing = 0, 0, 0.0
+    for label, path in files:
+        audio = read_wav(path)
+        detector.reset()
+        triggers = []
+        start = time.perf_counter()
+        for offset in range(0, len(audio), chunk):
+            if detector.process(audio[offset:offset + chunk]):
+                triggers.append(min(offset + chunk, len(audio)) / SAMPLE_RATE)
+        elapsed = time.perf_counter() - start
+        duration = len(audio) / SAMPLE_RATE
+        processing += elapsed
+        audio_seconds[label] += duration
+        if label == 'positive':
+            detected += bool(triggers)
+        else:
+            false_triggers += len(triggers)
+        first = f"{triggers[0]:.2f}" if triggers else "-"
+        print(f"{os.path.basename(path)[-30:]:>30} {label:>9} {len(triggers):>9} {first:>10} "
+              f"{detector.best_score:>7.3f} {duration / elapsed if elapsed else float('inf'):>11.0f}")
+    positives = sum(label == 'positive' for label, _ in files)
+    if positives:
+        print(f"Detected {detected}/{positives} positives")
+    if audio_seconds['negative']:
+        print(f"{false_triggers} false trigger(s) in {audio_seconds['negative']:.0f}s of negatives "
+              f"({false_triggers * 3600 / audio_seconds['negative']:.1f}/hour)")
+    print(f"Processed {sum(audio_seconds.values()):.0f}s of audio at {sum(audio_seconds.values()) / processing:.0f}x real time; "
+          f"{detector.checks} template matches, {detector.gated} skipped as silence")
+
+BENCHMARKS = {
+    'dataframe': lambda args: bench_dataframe(args.sizes or [10_000, 100_000, 1_000_000]),
+    'chunking': lambda args: bench_chunking(args.sizes or [1, 10, 100]),
+    'retrieval': lambda args: bench_retrieval(args.sizes or [10_000, 100_000, 1_000_000]),
+    'image_encoding': lambda args: bench_image_encoding(args.sizes or [0, 1120, 768], args.image, args.base_url),
+    'wakeword': lambda args: bench_wakeword(args.fixtures, args.templates),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance benchmarks for the ingestion, retrieval and image helpers.")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--sizes', type=int, nargs='+', help="Input sizes to run (benchmark-specific units)")
+    parser.add_argument('--image', default='screenshot.jpg', help="Source image for image_encoding")
+    parser.add_argument('--base-url', help="OpenAI-compatible endpoint (e.g. mock_openai_server.py) for image_encoding latency")
+    parser.add_argument('--fixtures', default='wake_fixtures', help="Directory with positive/ and negative/ WAV files for wakeword")
+    parser.add_argument('--templates', default='wake_templates', help="Directory of wake-word recordings for wakeword")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import re
+from collections import deque
+from typing import Iterable, Iterator, List, Tuple
+
+Span = Tuple[int, int]
+
+WORD_PATTERN = re.compile(r'\S+')
+
+def _cut(start: int, end: int, size: int) -> Iterator[Span]:
+    """Hard-split a span that has no usable break points into pieces of at most size characters."""
+    for piece_start in range(start, end, size):
+        yield piece_start, min(piece_start + size, end)
+
+def _word_units(text: str, start: int, end: int, chunk_size: int) -> Iterator[Span]:
+    for match in WORD_PATTERN.finditer(text, start, end):
+        word_start, word_end = match.span()
+        if word_end - word_start > chunk_size:
+            yield from _cut(word_start, word_end, chunk_size)
+        else:
+            yield word_start, word_end
+
+def _line_units(text: str, start: int, end: int, chunk_size: int) -> Iterator[Span]:
+    while start < end:
+        line_end = text.find('\n', start, end)
+        if line_end == -1:
+            line_end = end
+        if line_end - start > chunk_size:
+            yield from _word_units(text, start, line_end, chunk_size)
+        elif line_end > start:
+            yield start, line_end
+        start = line_end + 1
+
+def _section_units(text: str, chunk_size: int) -> Iterator[Span]:
+    """Sections separated by blank lines; oversized sections fall back to lines, then words."""
+    start, end = 0, len(text)
+    while start < end:
+        section_end = text.find('\n\n', start)
+        if section_end == -1:
+            section_end = end
+        if section_end - start > chunk_size:
+            yield from _line_units(text, start, section_end, chunk_size)
+        elif section_end > start:
+            yield start, section_end
+        start = section_end + 2
+
+def pack_spans(units: Iterable[Span], chunk_size: int, overlap: int) -> Iterator[Span]:
+    """Greedily pack consecutive units into spans of at most chunk_size characters.
+
+    Each new span restarts at the trailing units of the previous one that fit within overlap
+    characters. Every unit enters and leaves the window once, so packing is linear.
+    """
+    window = deque()
+    for unit in units:
+        if window and unit[1] - window[0][0] > chunk_size:
+            start, end = window[0][0], window[-1][1]
+            yield start, end
+            # Keep the trailing units inside the overlap; they open the next span
+            while window and (end - window[0][0] > overlap or unit[1] - window[0][0] > chunk_size):
+                window.popleft()
+        window.append(unit)
+    if window:
+        yield window[0][0], window[-1][1]
+
+def chunk_spans(text: str, chunk_size: int = 1000, overlap: int = 100, mode: str = 'sections') -> Iterator[Span]:
+    """Yield (start, end) character offsets of overlapping chunks of text, in O(len(text)).
+
+    mode='sections' keeps blank-line separated sections (such as spreadsheet entries) together,
+    mode='words' packs plain word windows.
+    """
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap must be non-negative and smaller than chunk_size")
+    if mode == 'sections':
+        units = _section_units(text, chunk_size)
+    elif mode == 'words':
+        units = _word_units(text, 0, len(text), chunk_size)
+    else:
+        raise ValueError(f"Unknown chunking mode: {mode}")
+    return pack_spans(units, chunk_size, overlap)
+
+def split_text(text: str, chunk_size: int = 1000, overlap: int = 100, mode: str = 'sections') -> List[str]:
+    """Split text into overlapping chunks."""
+    return [text[start:end] for start, end in chunk_spans(text, chunk_size, overlap, mode)]
+
+def iter_section_chunks(sections: Iterable[str], chunk_size: int = 1000, overlap: int = 100) -> Iterator[Tuple[str, int, int]]:
+    """Chunk a stream of sections, yielding (chunk, start, end) with offsets into the joined text.
+
+    The output is exactly that of chunk_spans over the sections joined with blank lines, but the
+    text is scanned as it arrives: a section's units are final once the blank line after it is
+    seen, and only text the packer can still reach (the last chunk_size characters of finished
+    units, plus the unfinished tail) is kept.
+    """
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap must be non-negative and smaller than chunk_size")
+    text = ""  # The joined text from absolute offset base on
+    base = 0
+
+    def units() -> Iterator[Span]:
+        nonlocal text, base
+        scan = 0  # Absolute offset where the next section unit starts
+        last_end = 0
+
+        def finished(final: bool) -> Iterator[Span]:
+            nonlocal scan, last_end
+            while scan - base < len(text):
+                start = scan - base
+                section_end = text.find('\n\n', start)
+                if section_end == -1:
+                    if not final:
+                        return
+                    section_end = len(text)
+                if section_end - start > chunk_size:
+                    pieces = list(_line_units(text, start, section_end, chunk_size))
+                else:
+                    pieces = [(start, section_end)] if section_end > start else []
+                scan = base + section_end + 2
+                for piece_start, piece_end in pieces:
+                    last_end = base + piece_end
+                    yield base + piece_start, base + piece_end
+
+        for i, section in enumerate(sections):
+            text += section if i == 0 else '\n\n' + section
+            yield from finished(final=False)
+            # Every span still to come starts within chunk_size of the last unit handed out
+            cut = min(scan, max(base, last_end - chunk_size)) - base
+            if cut > 0:
+                text, base = text[cut:], base + cut
+        yield from finished(final=True)
+
+    for start, end in pack_spans(units(), chunk_size, overlap):
+        yield text[start - base:end - base], start, end
+
+def split_sections(sections: Iterable[str], chunk_size: int = 1000, overlap: int = 100) -> Iterator[str]:
+    """Chunk a stream of sections exactly as split_text would chunk them joined with blank lines."""
+    for chunk, _, _ in iter_section_chunks(sections, chunk_size, overlap):
+        yield chunk
@@ -0,0 +1,105 @@
+import os
+import re
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+# Configuration
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', 2000))  # Tokens of retrieved text per prompt
+CONTEXT_CANDIDATES = int(os.getenv('CONTEXT_CANDIDATES', 20))  # Chunks retrieved for the packer to choose from
+TOKENIZER_ENCODING = os.getenv('TOKENIZER_ENCODING', 'cl100k_base')
+
+# Rough stand-in for a BPE tokenizer: words split into ~4 character pieces, punctuation separately
+APPROX_TOKEN_PATTERN = re.compile(r'\w{1,4}|[^\w\s]')
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+except Exception:  # Not installed, or the encoding cannot be loaded offline
+    _encoding = None
+
+def count_tokens(text: str) -> int:
+    """Token count of text, exact with tiktoken installed and a close estimate otherwise."""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(APPROX_TOKEN_PATTERN.findall(text))
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of text that fits in max_tokens."""
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text, disallowed_special=())[:max_tokens])
+    matches = list(APPROX_TOKEN_PATTERN.finditer(text))
+    return text if len(matches) <= max_tokens else text[:matches[max_tokens].start()]
+
+def overlap_length(previous: str, following: str, min_overlap: int = 20, max_overlap: int = 1000) -> int:
+    """Length of the longest suffix of previous that is also a prefix of following.
+
+    Matches shorter than min_overlap are ignored: they are more likely coincidence than chunk overlap.
+    """
+    for length in range(min(len(previous), len(following), max_overlap), min_overlap - 1, -1):
+        if previous.endswith(following[:length]):
+            return length
+    return 0
+
+class PackedContext(NamedTuple):
+    text: str
+    chunk_ids: List[Tuple[str, int]]  # (document key, chunk index) of every chunk used, best first
+    tokens: int
+
+def pack_context(matches: Iterable[Tuple[str, int, float]], chunk_text: Callable[[str, int], str],
+                 budget: int = CONTEXT_TOKEN_BUDGET,
+                 source: Optional[Callable[[str, int, int], str]] = None, chunk_overlap: int = 0) -> PackedContext:
+    """Fill a token budget with the best-scoring chunks.
+
+    Chunks are taken greedily by score, skipping any that no longer fit (a smaller one further down
+    may). Duplicate chunks are dropped, and neighbouring chunks of the same document are merged into
+    one passage so the text they share through chunk overlap is only sent once. Passages are
+    ordered by their best chunk, each in document order. With source, each passage is headed by
+    source(key, first chunk, last chunk), e.g. the document name and pages it came from.
+    chunk_overlap is the overlap the chunks were split with, which bounds the shared text looked for;
+    neighbours sharing none are joined with a blank line.
+    """
+    texts = {}  # (key, index) -> chunk text
+    seen = set()
+    selected = []
+    used = 0
+    for key, index, _ in matches:
+        text = chunk_text(key, index)
+        if not text.strip() or text in seen:
+            continue
+        # Only the part not already covered by selected neighbours costs anything
+        previous, following = texts.get((key, index - 1)), texts.get((key, index + 1))
+        start = overlap_length(previous, text, max_overlap=chunk_overlap) if previous is not None else 0
+        end = len(text) - overlap_length(text, following, max_overlap=chunk_overlap) if following is not None else len(text)
+        cost = count_tokens(text[start:max(start, end)])
+        if used + cost > budget:
+            if selected:
+                continue
+            text = truncate_tokens(text, budget)  # Always send something from the best match
+            cost = count_tokens(text)
+        seen.add(text)
+        texts[(key, index)] = text
+        selected.append((key, index))
+        used += cost
+
+    # Merge runs of consecutive chunks into passages
+    passages = []
+    placed = set()
+    for key, index in selected:
+        if (key, index) in placed:
+            continue
+        start = index
+        while (key, start - 1) in texts:
+            start -= 1
+        passage = ""
+        position = start
+        while (key, position) in texts:
+            text = texts[(key, position)]
+            shared = overlap_length(passage, text, max_overlap=chunk_overlap) if passage else 0
+            passage += text[shared:] if shared or not passage else "\n\n" + text
+            placed.add((key, position))
+            position += 1
+        if source is not None:
+            passage = f"[{source(key, start, position - 1)}]\n{passage}"
+        passages.append(passage)
+
+    context = "\n\n".join(passages)
+    return PackedContext(context, selected, count_tokens(context))
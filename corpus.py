@@ -0,0 +1,271 @@
+import hashlib
+import threading
+import numpy as np
+import scipy.sparse as sp
+from collections import OrderedDict
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from embeddings import Embedder, quantize
+from retrieval import RETRIEVERS, StackedVectors
+
+N_FEATURES = 2 ** 20  # Hashed term space shared by every segment
+BUILD_BATCH = 512  # Chunks vectorized at a time while a segment is being built
+
+def make_vectorizer(**vectorizer_kwargs) -> HashingVectorizer:
+    """Stateless vectorizer producing raw term counts, so documents never need a shared fit."""
+    return HashingVectorizer(n_features=N_FEATURES, alternate_sign=False, norm=None, **vectorizer_kwargs)
+
+def merge_counts(ids: np.ndarray, counts: np.ndarray, other_ids: np.ndarray, other_counts: np.ndarray,
+                 sign: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """Add (or subtract) one sparse term-count table to another, dropping terms that reach zero."""
+    merged_ids, inverse = np.unique(np.concatenate([ids, other_ids]), return_inverse=True)
+    merged = np.bincount(inverse, weights=np.concatenate([counts, sign * other_counts]), minlength=len(merged_ids))
+    keep = merged > 0
+    return merged_ids[keep], merged[keep].astype(np.int64)
+
+class Segment:
+    """One document's chunks, their raw hashed term counts and optional embeddings; immutable once built.
+
+    Spreadsheets also carry their typed table, for computing aggregates over every row, and PDFs
+    the (first, last) page each chunk came from.
+    """
+
+    def __init__(self, key: str, chunks: Sequence[str], counts: sp.csr_matrix, vectors: Optional[np.ndarray] = None,
+                 table=None, pages: Optional[np.ndarray] = None):
+        self.key = key
+        self.chunks = chunks
+        self.counts = counts.tocsr()
+        self.vectors = vectors  # One stored (float16 or int8) embedding per chunk, or None
+        self.table = table  # pandas DataFrame, or None
+        self.pages = pages  # (chunks, 2) int32 array of first and last page, or None
+        # Document frequency of each term within this segment: rows are deduplicated, so count indices
+        self.term_ids, self.term_counts = np.unique(self.counts.indices, return_counts=True)
+        self._nbytes = None
+
+    @classmethod
+    def build(cls, key: str, chunks: List[str], vectorizer: HashingVectorizer,
+              embedder: Optional[Embedder] = None) -> "Segment":
+        builder = SegmentBuilder(vectorizer, embedder)
+        builder.extend(chunks)
+        return builder.snapshot(key)
+
+    def __len__(self):
+        return len(self.chunks)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the segment: count arrays, vectors, table and chunk text."""
+        if self._nbytes is None:
+            counts_bytes = self.counts.data.nbytes + self.counts.indices.nbytes + self.counts.indptr.nbytes
+            vector_bytes = self.vectors.nbytes if self.vectors is not None else 0
+            table_bytes = int(self.table.memory_usage().sum()) if self.table is not None else 0
+            page_bytes = self.pages.nbytes if self.pages is not None else 0
+            self._nbytes = (counts_bytes + vector_bytes + table_bytes + page_bytes
+                            + sum(len(chunk) for chunk in self.chunks))
+        return self._nbytes
+
+class SegmentBuilder:
+    """Accumulates chunks into a segment, vectorizing (and embedding) them in batches as they arrive."""
+
+    def __init__(self, vectorizer: HashingVectorizer, embedder: Optional[Embedder] = None):
+        self.vectorizer = vectorizer
+        self.embedder = embedder
+        self.chunks = []
+        self.pages = []  # (first, last) page per chunk, or None where unknown
+        self._parts = []
+        self._vector_parts = []
+        self._pending = 0
+
+    def append(self, chunk: str, pages: Optional[Tuple[int, int]] = None):
+        self.chunks.append(chunk)
+        self.pages.append(pages)
+        self._pending += 1
+        if self._pending >= BUILD_BATCH:
+            self._flush()
+
+    def extend(self, chunks: Iterable[str]):
+        for chunk in chunks:
+            self.append(chunk)
+
+    def _flush(self):
+        if self._pending:
+            batch = self.chunks[-self._pending:]
+            counts = self.vectorizer.transform(batch).tocsr()
+            counts.sum_duplicates()
+            self._parts.append(counts)
+            if self.embedder is not None:
+                self._vector_parts.append(quantize(self.embedder.embed(batch)))
+            self._pending = 0
+
+    def snapshot(self, key: str, table=None) -> Segment:
+        """Segment over every chunk appended so far; the builder can keep growing afterwards."""
+        self._flush()
+        counts = sp.vstack(self._parts, format='csr') if self._parts else sp.csr_matrix((0, N_FEATURES))
+        self._parts = [counts]
+        vectors = None
+        if self.embedder is not None:
+            vectors = np.concatenate(self._vector_parts) if self._vector_parts else quantize(np.empty((0, self.embedder.dim)))
+            self._vector_parts = [vectors]
+        pages = None
+        if self.pages and all(span is not None for span in self.pages):
+            pages = np.array(self.pages, dtype=np.int32).reshape(-1, 2)
+        return Segment(key, list(self.chunks), counts, vectors, table, pages)
+
+class Corpus:
+    """Many documents searchable together, without refitting when one is added or removed.
+
+    Terms are hashed, so segments are vectorized once, independently. Adding or removing a segment
+    only merges its document frequencies into the corpus table; the retriever (see retrieval.RETRIEVERS)
+    is rebuilt from the stored counts and vectors by refresh(), which whoever changed the corpus calls
+    off the serving thread. Searches keep using the previous retriever until the new one is swapped
+    in, skipping documents removed since. Dense and hybrid retrievers need an embedder, and segments
+    built with it.
+    """
+
+    def __init__(self, vectorizer: HashingVectorizer, retriever: str = 'tfidf', embedder: Optional[Embedder] = None):
+        if retriever not in RETRIEVERS:
+            raise ValueError(f"Unknown retriever {retriever!r}; expected one of {sorted(RETRIEVERS)}")
+        self.vectorizer = vectorizer
+        self.retriever = retriever
+        self.embedder = embedder
+        self.segments = OrderedDict()  # key -> Segment
+        self.names = {}  # key -> display name
+        # (term ids, document frequencies, chunk count), replaced as a whole so readers never mix generations
+        self._df = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), 0)
+        self._view = None  # (retriever, segment row starts, segment keys), swapped in by refresh()
+        self._generation = 0  # Bumped by every change
+        self._view_generation = -1  # Generation the current view was built from
+        self._lock = threading.Lock()
+
+    def add(self, segment: Segment, name: Optional[str] = None):
+        with self._lock:
+            if segment.key in self.segments:
+                return
+            self.segments[segment.key] = segment
+            self.names[segment.key] = name or segment.key
+            ids, counts, n_chunks = self._df
+            self._df = merge_counts(ids, counts, segment.term_ids, segment.term_counts) + (n_chunks + len(segment),)
+            self._generation += 1
+
+    def remove(self, key: str) -> Optional[Segment]:
+        with self._lock:
+            segment = self.segments.pop(key, None)
+            if segment is None:
+                return None
+            del self.names[key]
+            ids, counts, n_chunks = self._df
+            self._df = merge_counts(ids, counts, segment.term_ids, segment.term_counts, sign=-1) + (n_chunks - len(segment),)
+            self._generation += 1
+            return segment
+
+    def __len__(self):
+        return self._df[2]
+
+    def __contains__(self, key: str):
+        return key in self.segments
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the exact set of documents, and so the IDF weights, behind a query vector."""
+        return hashlib.sha1("|".join(self.segments).encode()).hexdigest()
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the corpus itself, excluding the (shareable) segments."""
+        view = self._view
+        df_bytes = self._df[0].nbytes + self._df[1].nbytes
+        if view is None:
+            return df_bytes
+        return view[0].nbytes + df_bytes
+
+    def idf(self, term_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Smoothed IDF (as TfidfVectorizer computes it) for the given terms, and which of them occur at all."""
+        df_ids, df_counts, n_chunks = self._df  # One generation, even while documents are added
+        positions = np.searchsorted(df_ids, term_ids)
+        positions = np.minimum(positions, max(len(df_ids) - 1, 0))
+        known = (df_ids[positions] == term_ids) if len(df_ids) else np.zeros(len(term_ids), dtype=bool)
+        df = np.where(known, df_counts[positions] if len(df_ids) else 0, 0)
+        return np.log((1 + n_chunks) / (1 + df)) + 1, known
+
+    def refresh(self):
+        """Build the retriever for the current segments and swap it in, unless a newer one got there first.
+
+        Runs without holding the lock, so searches carry on against the previous retriever meanwhile.
+        """
+        with self._lock:
+            generation = self._generation
+            segments = list(self.segments.values())
+        if generation <= self._view_generation:
+            return
+        parts = [segment.counts for segment in segments]
+        counts = sp.vstack(parts, format='csr') if parts else sp.csr_matrix((0, N_FEATURES))
+        vectors = None
+        if segments and all(segment.vectors is not None for segment in segments):
+            vectors = StackedVectors([segment.vectors for segment in segments])
+        row_starts = np.cumsum([0] + [len(segment) for segment in segments])
+        retriever = RETRIEVERS[self.retriever](self, counts, vectors)
+        with self._lock:
+            if generation > self._view_generation:
+                self._view = (retriever, row_starts, [segment.key for segment in segments])
+                self._view_generation = generation
+
+    def _current_view(self):
+        """The latest retriever, built here only if refresh() has not produced one yet."""
+        if self._view is None:
+            self.refresh()
+        return self._view
+
+    def query_vector(self, query: str):
+        """L2-normalized TF-IDF row for the query, keeping only terms that occur in the corpus."""
+        counts = self.vectorizer.transform([query]).tocsr()
+        counts.sum_duplicates()
+        idf, known = self.idf(counts.indices.astype(np.int64))
+        vector = sp.csr_matrix(
+            ((counts.data * idf)[known], counts.indices[known], [0, int(known.sum())]), shape=(1, N_FEATURES)
+        )
+        return normalize(vector, norm='l2', copy=False)
+
+    @staticmethod
+    def _ranges(view, keys) -> np.ndarray:
+        """Row ranges, as [start, end) pairs, covered by the given document keys."""
+        _, row_starts, segment_keys = view
+        positions = [position for position, key in enumerate(segment_keys) if key in keys]
+        return np.array([(row_starts[p], row_starts[p + 1]) for p in positions], dtype=np.int64).reshape(-1, 2)
+
+    @staticmethod
+    def _locate(view, row: int) -> Tuple[str, int]:
+        """Map a corpus row back to (document key, chunk index within the document)."""
+        _, row_starts, segment_keys = view
+        position = int(np.searchsorted(row_starts, row, side='right')) - 1
+        return segment_keys[position], row - int(row_starts[position])
+
+    def search(self, query: str, top_k: int = 3, min_score: Optional[float] = None,
+               keys: Optional[Iterable[str]] = None) -> List[Tuple[str, int, float]]:
+        """Return (document key, chunk index, score) for the best matches, best first."""
+        view = self._current_view()
+        ranges = self._ranges(view, set(keys)) if keys is not None else None
+        rows, scores = view[0].search(query, top_k, ranges)
+        results = []
+        for row, score in zip(rows, scores):
+            score = float(score)
+            if min_score is not None and score <= min_score:
+                continue
+            key, chunk_index = self._locate(view, int(row))
+            if key not in self.segments:
+                continue  # Removed since the view was built
+            results.append((key, chunk_index, score))
+        return results
+
+    def chunk(self, key: str, chunk_index: int) -> str:
+        return self.segments[key].chunks[chunk_index]
+
+    def source(self, key: str, first: int, last: int) -> str:
+        """Label for chunks first..last of a document: its name, plus their pages when known."""
+        segment = self.segments[key]
+        name = self.names[key]
+        if segment.pages is None:
+            return name
+        low, high = int(segment.pages[first, 0]), int(segment.pages[last, 1])
+        return f"{name}, page {low}" if low == high else f"{name}, pages {low}-{high}"
@@ -1,113 +1,63 @@
+import asyncio
 import gradio as gr
-import PyPDF2
+import logging
 import numpy as np
-from openai import OpenAI
+from openai import AsyncOpenAI
 import os
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import pandas as pd
+from context import CONTEXT_CANDIDATES, CONTEXT_TOKEN_BUDGET, PackedContext, count_tokens, pack_context
+from corpus import Corpus, Segment, SegmentBuilder, make_vectorizer
+from embeddings import VECTOR_DTYPE, make_embedder
+from index_store import IndexStore
+from ingest import stream_chunks
+from response_cache import ResponseCache
+from sessions import SessionRegistry
+from jobs import IngestJob, IngestPool
+from tables import column_summary, format_result, load_table, parse_plan, plan_prompt, run_query
 import io
-from typing import List, Union
-import openpyxl
+from typing import List, Optional, Tuple, Union
 
 # Initialize OpenAI client with LiteLLM configuration
-client = OpenAI(
+# The async client streams completions without tying up a Gradio worker per chat
+client = AsyncOpenAI(
     api_key=os.getenv('OPENAI_API_KEY'),  # Your LiteLLM API key
-    base_url="https://litellm.deriv.ai/v1"  # LiteLLM endpoint
+    base_url=os.getenv('OPENAI_BASE_URL', "https://litellm.deriv.ai/v1")  # LiteLLM endpoint
 )
+logger = logging.getLogger(__name__)
 
 # Configuration
 LITELLM_MODEL = os.getenv('OPENAI_MODEL_NAME', 'gpt-3.5-turbo')  # Default model, can be overridden by env var
+TEMPERATURE = 0.7
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100  # Characters shared between consecutive chunks
+PROGRESS_EVERY = 500  # Report upload progress every N chunks
+PROGRESS_INTERVAL = 0.5  # Seconds between upload status refreshes
+PARTIAL_INDEX_MIN_CHUNKS = 2000  # Publish a searchable partial index once this many chunks are read
+RETRIEVER = os.getenv('RETRIEVER', 'tfidf')  # 'tfidf', 'bm25', 'dense' or 'hybrid'
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')  # 'hashing' for the local stand-in
+VECTORIZER_CONFIG = {
+    'stop_words': 'english',
+    'token_pattern': r'(?u)\b\w+\b',  # Include single-character words
+    'ngram_range': (1, 2),  # Include bigrams for better context
+}
 
-def extract_text_from_file(file) -> str:
-    """Extract text from PDF or spreadsheet file."""
-    file_ext = file.name.split('.')[-1].lower()
-    
-    if file_ext == 'pdf':
-        pdf_reader = PyPDF2.PdfReader(file.name)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-        return text
-    
-    elif file_ext in ['xlsx', 'xls']:
-        df = pd.read_excel(file.name)
-        return process_dataframe(df)
-    
-    elif file_ext == 'csv':
-        df = pd.read_csv(file.name)
-        return process_dataframe(df)
-    
-    else:
-        raise ValueError(f"Unsupported file type: {file_ext}")
-
-def process_dataframe(df: pd.DataFrame) -> str:
-    """Convert DataFrame to structured text format."""
-    # Drop empty columns and rows
-    df = df.dropna(how='all', axis=1).dropna(how='all', axis=0)
-    
-    # Convert DataFrame to structured text
-    text_chunks = []
-    
-    # Add column names as context
-    columns_desc = "Columns: " + ", ".join(df.columns.astype(str))
-    text_chunks.append(columns_desc)
-    
-    # Process each row
-    for idx, row in df.iterrows():
-        # Create a structured text representation of the row
-        row_text = f"Entry {idx + 1}:\n"
-        for col in df.columns:
-            value = row[col]
-            if pd.notna(value):  # Only include non-null values
-                row_text += f"{col}: {value}\n"
-        text_chunks.append(row_text)
-    
-    return "\n\n".join(text_chunks)
-
-def split_text(text: str, chunk_size: int = 1000, overlap: int = 100) -> List[str]:
-    """Split text into overlapping chunks with improved handling of structured data."""
-    # Split by double newlines to preserve data structure
-    sections = text.split('\n\n')
-    chunks = []
-    current_chunk = []
-    current_size = 0
-    
-    for section in sections:
-        section_size = len(section)
-        
-        # If a single section is larger than chunk_size, split it by single newlines
-        if section_size > chunk_size:
-            lines = section.split('\n')
-            for line in lines:
-                if current_size + len(line) > chunk_size:
-                    if current_chunk:
-                        chunks.append('\n'.join(current_chunk))
-                        # Keep last few lines for overlap
-                        current_chunk = current_chunk[-3:] if len(current_chunk) > 3 else current_chunk
-                        current_size = sum(len(line) + 1 for line in current_chunk)
-                current_chunk.append(line)
-                current_size += len(line) + 1
-        else:
-            if current_size + section_size > chunk_size:
-                chunks.append('\n'.join(current_chunk))
-                # Keep last entry for overlap
-                current_chunk = current_chunk[-1:] if current_chunk else []
-                current_size = sum(len(line) + 1 for line in current_chunk)
-            current_chunk.append(section)
-            current_size += section_size + 2  # +2 for double newline
-    
-    if current_chunk:
-        chunks.append('\n'.join(current_chunk))
-    
-    return chunks
+# Indexes are cached on disk by file content, so re-uploads and restarts skip re-ingestion
+index_store = IndexStore()
+# Answers are reused across sessions for repeated questions against the same document
+response_cache = ResponseCache()
+# Hashed terms let documents be added to or removed from a corpus without refitting
+vectorizer = make_vectorizer(**VECTORIZER_CONFIG)
+# Chunks are only embedded when a dense or hybrid retriever will use the vectors
+embedder = make_embedder(EMBEDDING_MODEL) if RETRIEVER in ('dense', 'hybrid') else None
+# Everything that changes what gets stored for a document goes into its cache key
+INDEX_CONFIG = dict(VECTORIZER_CONFIG, embedding=embedder.name, vector_dtype=VECTOR_DTYPE) if embedder else VECTORIZER_CONFIG
+# Each browser session gets its own corpus; sessions uploading the same file share one segment
+sessions = SessionRegistry(lambda: Corpus(vectorizer, retriever=RETRIEVER, embedder=embedder))
+# Uploads are processed in the background, several per session; re-uploading a file cancels its earlier job
+ingest_jobs = IngestPool()
 
 class ChatBot:
     def __init__(self):
         self.messages = []
-        self.chunks = None
-        self.vectorizer = None
-        self.faq_loaded = False
         self.system_prompt = """You are a helpful AI assistant specializing in understanding and explaining data from documents and spreadsheets. 
         When providing information:
         1. Be precise and accurate with numbers and facts
@@ -116,53 +66,162 @@ class ChatBot:
         4. If you're unsure about something, say so
         5. Format numerical data clearly and consistently"""
 
-    def process_faq(self, file):
+    def document_choices(self, session_id: str):
+        """(name, key) pairs for the session's documents, for the document filter."""
+        corpus = sessions.get(session_id)
+        if corpus is None:
+            return []
+        return [(f"{name} (indexing)" if '#partial' in key else name, key) for key, name in corpus.names.items()]
+
+    def process_faq(self, file, request: gr.Request):
         if file is None:
-            return "Please upload a file."
-        
+            yield "Please upload a file.", gr.update()
+            return
+
+        # Ingestion runs on the background pool; this handler only relays its progress
         try:
-            # Extract text using the enhanced extraction function
-            content_text = extract_text_from_file(file)
-            
-            # Create chunks with the improved chunking strategy
-            self.chunks = split_text(content_text)
-            
-            # Initialize and fit the vectorizer with stop words removed
-            self.vectorizer = TfidfVectorizer(
-                stop_words='english',
-                token_pattern=r'(?u)\b\w+\b',  # Include single-character words
-                ngram_range=(1, 2)  # Include bigrams for better context
-            )
-            self.vectorizer.fit(self.chunks)
-            
-            self.faq_loaded = True
-            return f"Document processed successfully! Found {len(self.chunks)} sections."
+            key = index_store.key(file.name, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP, **INDEX_CONFIG)
+        except OSError as e:
+            yield f"Error processing file: {str(e)}", gr.update()
+            return
+        job = ingest_jobs.submit(request.session_hash, key, self.ingest, file.name, key)
+        while not job.wait(PROGRESS_INTERVAL):
+            yield job.status, gr.update(choices=self.document_choices(request.session_hash))
+        yield job.status, gr.update(choices=self.document_choices(request.session_hash))
+
+    def ingest(self, job: IngestJob, path: str, key: str):
+        """Add an uploaded file to the job's session corpus, publishing partial segments as it goes."""
+        name = os.path.basename(path)
+        partial_key = None
+        job.status = f"Processing {name}..."
+
+        def pdf_progress(pages_done: int, page_count: int):
+            job.status = f"Processing {name}... text extracted from {pages_done} of {page_count} pages."
+
+        try:
+            # Another session may already hold this document in memory
+            segment = sessions.document(key)
+            if segment is None:
+                segment = index_store.load(key)
+            # Spreadsheets keep their typed table for aggregate questions
+            is_table = path.split('.')[-1].lower() in ('csv', 'xlsx', 'xls')
+            if segment is not None and is_table and segment.table is None:
+                segment = Segment(segment.key, segment.chunks, segment.counts, segment.vectors, load_table(path), segment.pages)
+            elif segment is not None and segment.table is not None:
+                column_summary(segment.table)  # A stored table may come back without its summary
+
+            if segment is None:
+                # Stream rows/pages straight into the chunker and vectorizer instead of building the full text
+                builder = SegmentBuilder(vectorizer, embedder)
+                next_partial = PARTIAL_INDEX_MIN_CHUNKS
+                for chunk, units_read, pages in stream_chunks(path, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP,
+                                                              on_pdf_progress=pdf_progress):
+                    if job.cancelled:
+                        if partial_key is not None:
+                            sessions.remove(job.session_id, partial_key)
+                        return
+                    builder.append(chunk, pages)
+                    chunk_count = len(builder.chunks)
+                    if chunk_count % PROGRESS_EVERY == 0:
+                        job.status = f"Processing {name}... {units_read} rows/pages read, {chunk_count} sections so far."
+                    if chunk_count >= next_partial:
+                        # Let the session query what has been read so far; doubling keeps snapshots linear overall
+                        partial = builder.snapshot(f"{key}#partial-{chunk_count}")
+                        job.publish(sessions.add, job.session_id, partial, name, partial_key)
+                        partial_key = partial.key
+                        next_partial *= 2
+
+                job.status = f"Processing {name}... {len(builder.chunks)} sections read, building the index."
+                segment = builder.snapshot(key, table=load_table(path) if is_table else None)
+                index_store.save(segment)
+
+            if job.publish(sessions.add, job.session_id, segment, name, partial_key):
+                job.status = f"{name} processed successfully! Found {len(segment)} sections."
+            elif partial_key is not None:
+                sessions.remove(job.session_id, partial_key)
         except Exception as e:
-            return f"Error processing file: {str(e)}"
+            if partial_key is not None:
+                sessions.remove(job.session_id, partial_key)
+            job.status = f"Error processing file: {str(e)}"
 
-    def find_relevant_chunks(self, query: str, top_k: int = 3) -> List[str]:
+    def remove_documents(self, keys, request: gr.Request):
+        for key in keys or []:
+            # A document still being indexed is listed under its partial key
+            ingest_jobs.cancel(request.session_hash, key.split('#partial')[0], reason="removed")
+            sessions.remove(request.session_hash, key)
+        return f"Removed {len(keys or [])} document(s).", gr.update(choices=self.document_choices(request.session_hash), value=[])
+
+    def find_relevant_matches(self, corpus: Corpus, query: str, top_k: int = CONTEXT_CANDIDATES,
+                              keys: Optional[List[str]] = None) -> List[Tuple[str, int, float]]:
+        """Find (document key, chunk index, score) for the most relevant chunks for a given query."""
+        # Any positive score counts; the token budget, not a similarity cutoff, decides how much is sent
+        return corpus.search(query, top_k=top_k, min_score=0.0, keys=keys)
+
+    def find_relevant_chunks(self, corpus: Corpus, query: str, top_k: int = CONTEXT_CANDIDATES,
+                             keys: Optional[List[str]] = None) -> List[str]:
         """Find the most relevant chunks for a given query."""
-        query_vector = self.vectorizer.transform([query])
-        chunk_vectors = self.vectorizer.transform(self.chunks)
-        similarities = cosine_similarity(query_vector, chunk_vectors)[0]
-        
-        # Get top k chunks
-        top_indices = similarities.argsort()[-top_k:][::-1]
-        return [self.chunks[i] for i in top_indices if similarities[i] > 0.1]
+        return [corpus.chunk(key, i) for key, i, _ in self.find_relevant_matches(corpus, query, top_k, keys)]
+
+    def build_context(self, corpus: Corpus, query: str, keys: Optional[List[str]] = None,
+                      budget: int = CONTEXT_TOKEN_BUDGET) -> PackedContext:
+        """Pack the best chunks for a query into the context token budget, each passage labelled with its source."""
+        return pack_context(self.find_relevant_matches(corpus, query, keys=keys), corpus.chunk, budget, corpus.source,
+                            chunk_overlap=CHUNK_OVERLAP)
+
+    def tables(self, corpus: Corpus, keys: Optional[List[str]] = None) -> dict:
+        """Display name -> DataFrame for the spreadsheets among the searched documents."""
+        return {corpus.names[key]: segment.table for key, segment in list(corpus.segments.items())
+                if segment.table is not None and (keys is None or key in keys)}
+
+    async def compute_from_tables(self, message: str, tables: dict) -> Optional[str]:
+        """Let the LLM choose one aggregate over the tables and compute it; None if the question needs none."""
+        response = await client.chat.completions.create(
+            model=LITELLM_MODEL,
+            messages=[{"role": "user", "content": plan_prompt(message, tables)}],
+            temperature=0,
+            max_tokens=300
+        )
+        plan = parse_plan(response.choices[0].message.content or "")
+        if plan is None or plan.table not in tables:
+            return None
+        try:
+            # Large tables take a moment; keep the event loop free for other chats
+            result = await asyncio.to_thread(run_query, tables[plan.table], plan)
+        except (ValueError, TypeError, KeyError):
+            return None  # The plan named a missing column or an impossible operation; fall back to the text
+        return format_result(plan, result)
 
-    def respond(self, message, history):
-        if not self.faq_loaded:
-            return "Please upload a document first."
+    async def respond(self, message, history, documents, request: gr.Request):
+        corpus = sessions.get(request.session_hash)
+        if corpus is None or not len(corpus):
+            yield "Please upload a document first."
+            return
+        # An empty selection searches every document
+        keys = documents or None
 
         try:
-            # Find multiple relevant chunks
-            relevant_chunks = self.find_relevant_chunks(message)
-            
-            if not relevant_chunks:
-                return "I couldn't find relevant information to answer your question. Please try rephrasing it."
+            # Fill the context budget with the most relevant chunks; scoring a large corpus takes a moment,
+            # so it runs off the event loop like run_query
+            packed = await asyncio.to_thread(self.build_context, corpus, message, keys=keys)
+            tables = self.tables(corpus, keys)
 
-            # Combine relevant chunks with context
-            context = "\n\n".join(relevant_chunks)
+            if not packed.chunk_ids and not tables:
+                yield "I couldn't find relevant information to answer your question. Please try rephrasing it."
+                return
+
+            # Reuse the answer if this question was already asked against the same context
+            cache_key = response_cache.key(corpus.fingerprint, packed.chunk_ids, message, LITELLM_MODEL, TEMPERATURE)
+            query_vector = corpus.query_vector(message)
+            cached = response_cache.get(cache_key, query_vector)
+            if cached is not None:
+                yield cached
+                return
+
+            # Aggregates are computed over every row rather than guessed from the retrieved ones
+            computed = await self.compute_from_tables(message, tables) if tables else None
+            context = packed.text
+            if computed is not None:
+                context = f"Exact figures computed over the full table:\n{computed}\n\n{context}"
 
             messages = [
                 {"role": "system", "content": self.system_prompt},
@@ -174,18 +233,34 @@ Question: {message}
 
 Please provide a helpful response, citing specific data where relevant."""}
             ]
+            prompt_tokens = sum(count_tokens(m["content"]) for m in messages)
+            logger.info("Prompt: %d tokens, %d of them context from %d chunk(s)",
+                        prompt_tokens, packed.tokens, len(packed.chunk_ids))
 
-            response = client.chat.completions.create(
+            stream = await client.chat.completions.create(
                 model=LITELLM_MODEL,
                 messages=messages,
-                temperature=0.7,
-                max_tokens=500
+                temperature=TEMPERATURE,
+                max_tokens=500,
+                stream=True
             )
-            
-            return response.choices[0].message.content
+
+            # Yield the growing answer so the chat shows tokens as they arrive
+            parts = []
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield "".join(parts)
+
+            # Only completed answers are cached
+            response_cache.put(cache_key, "".join(parts), query_vector)
 
         except Exception as e:
-            return f"Error generating response: {str(e)}"
+            yield f"Error generating response: {str(e)}"
+
+    def release_session(self, request: gr.Request):
+        ingest_jobs.cancel(request.session_hash)
+        sessions.release(request.session_hash)
 
 def create_demo():
     chatbot = ChatBot()
@@ -195,26 +270,45 @@ def create_demo():
         # Data-Aware AI Assistant
         Using model: {LITELLM_MODEL}
         
-        Upload your document (PDF, Excel, or CSV) and start chatting!
+        Upload your documents (PDF, Excel, or CSV) and start chatting!
         """)
         
         with gr.Row():
             file_upload = gr.File(label="Upload Document", file_types=[".pdf", ".xlsx", ".xls", ".csv"])
             upload_status = gr.Textbox(label="Upload Status", interactive=False)
+
+        with gr.Row():
+            document_filter = gr.Dropdown(
+                label="Search in", choices=[], multiselect=True,
+                info="Leave empty to search all uploaded documents"
+            )
+            remove_button = gr.Button("Remove selected")
         
         file_upload.upload(
             fn=chatbot.process_faq,
             inputs=[file_upload],
-            outputs=[upload_status]
+            outputs=[upload_status, document_filter],
+            concurrency_limit=None  # The handler only relays progress; ingest_jobs bounds the real work
+        )
+
+        remove_button.click(
+            fn=chatbot.remove_documents,
+            inputs=[document_filter],
+            outputs=[upload_status, document_filter]
         )
         
         chatbot_interface = gr.ChatInterface(
             chatbot.respond,
+            additional_inputs=[document_filter],
             chatbot=gr.Chatbot(height=400),
             title="Chat with our AI Assistant",
             description="Ask any questions about our services!",
+            concurrency_limit=None,  # Streaming handlers are async, so chats need not queue behind each other
         )
 
+        # Free the session's document when its browser tab closes
+        demo.unload(chatbot.release_session)
+
     return demo
 
 if __name__ == "__main__":
@@ -234,5 +328,6 @@ if __name__ == "__main__":
         print('export OPENAI_API_KEY="your-litellm-api-key"')
         print('export OPENAI_MODEL_NAME="your-chosen-model"  # Optional')
     else:
+        logging.basicConfig(level=os.getenv('LOG_LEVEL', 'WARNING'))  # LOG_LEVEL=INFO shows per-prompt token counts
         demo = create_demo()
         demo.launch()
\ No newline at end of file
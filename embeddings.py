@@ -0,0 +1,72 @@
+import os
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from typing import List
+
+# Configuration
+EMBEDDING_BATCH = int(os.getenv('EMBEDDING_BATCH', 64))  # Chunks per forward pass of the model
+VECTOR_DTYPE = os.getenv('VECTOR_DTYPE', 'float16')  # Storage type of chunk vectors: 'float16' or 'int8'
+INT8_SCALE = 127.0  # Unit vectors have components in [-1, 1], so int8 storage is a fixed rescale
+
+def quantize(vectors: np.ndarray, dtype: str = VECTOR_DTYPE) -> np.ndarray:
+    """Compact storage form of L2-normalized float vectors."""
+    if dtype == 'float16':
+        return vectors.astype(np.float16)
+    if dtype == 'int8':
+        return np.round(vectors * INT8_SCALE).astype(np.int8)
+    raise ValueError(f"Unsupported vector dtype {dtype!r}; expected 'float16' or 'int8'")
+
+def vector_scale(vectors: np.ndarray) -> float:
+    """Divisor turning dot products with stored vectors back into cosine similarities."""
+    return INT8_SCALE if vectors.dtype == np.int8 else 1.0
+
+class Embedder:
+    """Maps texts to L2-normalized float32 vectors of a fixed dimension."""
+
+    name = None
+    dim = None
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+class HashingEmbedder(Embedder):
+    """Deterministic, dependency-free stand-in for a model: hashed character n-grams.
+
+    It does not understand paraphrases, but keeps the dense path runnable (and reproducible)
+    without downloading weights.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.name = f'hashing-{dim}'
+        self.dim = dim
+        self._vectorizer = HashingVectorizer(n_features=dim, analyzer='char_wb', ngram_range=(3, 4), norm='l2')
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self._vectorizer.transform(texts).toarray().astype(np.float32)
+
+class SentenceTransformerEmbedder(Embedder):
+    """Small sentence-transformers model run on the CPU."""
+
+    def __init__(self, model_name: str, batch_size: int = EMBEDDING_BATCH):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "Dense retrieval needs sentence-transformers (pip install sentence-transformers); "
+                "set EMBEDDING_MODEL=hashing to use the local stand-in instead"
+            ) from e
+        self.name = model_name
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size, normalize_embeddings=True,
+                                    convert_to_numpy=True)
+        return vectors.astype(np.float32)
+
+def make_embedder(name: str) -> Embedder:
+    """'hashing' for the local stand-in, otherwise a sentence-transformers model name."""
+    if name == 'hashing':
+        return HashingEmbedder()
+    return SentenceTransformerEmbedder(name)
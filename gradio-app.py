@@ -1,88 +1,86 @@
 import gradio as gr
-import PyPDF2
 import numpy as np
-from openai import OpenAI
+from openai import AsyncOpenAI
 import os
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from corpus import Corpus, Segment, make_vectorizer
+from index_store import IndexStore
+from ingest import extract_text_from_pdf
+from chunking import split_text
+from response_cache import ResponseCache
+from sessions import SessionRegistry
 
 # Initialize OpenAI client with LiteLLM configuration
-client = OpenAI(
+# The async client streams completions without tying up a Gradio worker per chat
+client = AsyncOpenAI(
     api_key=os.getenv('OPENAI_API_KEY'),  # Your LiteLLM API key
-    base_url="https://litellm.deriv.ai/v1"  # LiteLLM endpoint
+    base_url=os.getenv('OPENAI_BASE_URL', "https://litellm.deriv.ai/v1")  # LiteLLM endpoint
 )
 
 # Configuration
 LITELLM_MODEL = os.getenv('OPENAI_MODEL_NAME', 'gpt-3.5-turbo')  # Default model, can be overridden by env var
+TEMPERATURE = 0.7
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 0  # Characters shared between consecutive chunks
 
-def extract_text_from_pdf(pdf_file):
-    """Extract text from uploaded PDF file."""
-    pdf_reader = PyPDF2.PdfReader(pdf_file.name)
-    text = ""
-    for page in pdf_reader.pages:
-        text += page.extract_text()
-    return text
-
-def split_text(text, chunk_size=1000):
-    """Split text into chunks of approximately equal size."""
-    words = text.split()
-    chunks = []
-    current_chunk = []
-    current_size = 0
-    
-    for word in words:
-        current_chunk.append(word)
-        current_size += len(word) + 1  # +1 for space
-        
-        if current_size >= chunk_size:
-            chunks.append(' '.join(current_chunk))
-            current_chunk = []
-            current_size = 0
-    
-    if current_chunk:  # Add the last chunk if it exists
-        chunks.append(' '.join(current_chunk))
-    
-    return chunks
+# Indexes are cached on disk by file content, so re-uploads and restarts skip re-ingestion
+index_store = IndexStore()
+# Answers are reused across sessions for repeated questions against the same document
+response_cache = ResponseCache()
+# Hashed terms let documents be added to a corpus without refitting
+vectorizer = make_vectorizer()
+# Each browser session gets its own corpus; sessions uploading the same file share one segment
+sessions = SessionRegistry(lambda: Corpus(vectorizer))
 
-def find_most_relevant_chunk(query, chunks, vectorizer):
-    """Find the most relevant text chunk for a given query."""
-    query_vector = vectorizer.transform([query])
-    chunk_vectors = vectorizer.transform(chunks)
-    similarities = cosine_similarity(query_vector, chunk_vectors)
-    most_relevant_idx = similarities.argmax()
-    return chunks[most_relevant_idx]
+def find_most_relevant_chunk(query, corpus):
+    """Find the (document key, chunk index) of the most relevant text chunk for a given query."""
+    key, most_relevant_idx, _ = corpus.search(query, top_k=1)[0]
+    return key, most_relevant_idx
 
 class ChatBot:
     def __init__(self):
         self.messages = []
-        self.chunks = None
-        self.vectorizer = None
-        self.faq_loaded = False
         self.system_prompt = """You are a friendly and helpful AI customer service assistant. 
         Provide clear, concise, and accurate responses based on the FAQ information provided. 
         If you're not sure about something, please say so."""
 
-    def process_faq(self, pdf_file):
+    def process_faq(self, pdf_file, request: gr.Request):
         if pdf_file is None:
             return "Please upload a PDF file."
         
         try:
-            faq_text = extract_text_from_pdf(pdf_file)
-            self.chunks = split_text(faq_text)
-            self.vectorizer = TfidfVectorizer()
-            self.vectorizer.fit(self.chunks)
-            self.faq_loaded = True
-            return "FAQ document loaded successfully!"
+            key = index_store.key(pdf_file.name, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP, mode='words')
+            # Another session may already hold this document in memory
+            segment = sessions.document(key)
+            if segment is None:
+                segment = index_store.load(key)
+            if segment is None:
+                faq_text = extract_text_from_pdf(pdf_file.name)
+                segment = Segment.build(key, split_text(faq_text, CHUNK_SIZE, CHUNK_OVERLAP, mode='words'), vectorizer)
+                index_store.save(segment)
+            # Each upload is added to the session's corpus alongside the earlier ones
+            sessions.add(request.session_hash, segment, os.path.basename(pdf_file.name))
+            return f"FAQ document loaded successfully! {len(sessions.get(request.session_hash).segments)} document(s) loaded."
         except Exception as e:
             return f"Error processing PDF: {str(e)}"
 
-    def respond(self, message, history):
-        if not self.faq_loaded:
-            return "Please upload an FAQ document first."
+    async def respond(self, message, history, request: gr.Request):
+        corpus = sessions.get(request.session_hash)
+        if corpus is None or not len(corpus):
+            yield "Please upload an FAQ document first."
+            return
 
         try:
             # Find most relevant chunk
-            relevant_chunk = find_most_relevant_chunk(message, self.chunks, self.vectorizer)
+            relevant_id = find_most_relevant_chunk(message, corpus)
+            relevant_chunk = corpus.chunk(*relevant_id)
+
+            # Reuse the answer if this question was already asked against the same context
+            cache_key = response_cache.key(corpus.fingerprint, [relevant_id], message, LITELLM_MODEL, TEMPERATURE)
+            query_vector = corpus.query_vector(message)
+            cached = response_cache.get(cache_key, query_vector)
+            if cached is not None:
+                yield cached
+                return
 
             # Prepare messages for API
             messages = [
@@ -97,17 +95,29 @@ class ChatBot:
             ]
 
             # Generate response using LiteLLM
-            response = client.chat.completions.create(
+            stream = await client.chat.completions.create(
                 model=LITELLM_MODEL,
                 messages=messages,
-                temperature=0.7,
-                max_tokens=500
+                temperature=TEMPERATURE,
+                max_tokens=500,
+                stream=True
             )
-            
-            return response.choices[0].message.content
+
+            # Yield the growing answer so the chat shows tokens as they arrive
+            parts = []
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield "".join(parts)
+
+            # Only completed answers are cached
+            response_cache.put(cache_key, "".join(parts), query_vector)
 
         except Exception as e:
-            return f"Error generating response: {str(e)}"
+            yield f"Error generating response: {str(e)}"
+
+    def release_session(self, request: gr.Request):
+        sessions.release(request.session_hash)
 
 def create_demo():
     chatbot = ChatBot()
@@ -117,7 +127,7 @@ def create_demo():
         # Customer Support AI Assistant
         Using model: {LITELLM_MODEL}
         
-        Upload your FAQ document (PDF) and start chatting!
+        Upload your FAQ documents (PDF) and start chatting!
         """)
         
         with gr.Row():
@@ -135,8 +145,12 @@ def create_demo():
             chatbot=gr.Chatbot(height=400),
             title="Chat with our AI Assistant",
             description="Ask any questions about our services!",
+            concurrency_limit=None,  # Streaming handlers are async, so chats need not queue behind each other
         )
 
+        # Free the session's document when its browser tab closes
+        demo.unload(chatbot.release_session)
+
     return demo
 
 if __name__ == "__main__":
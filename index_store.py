@@ -0,0 +1,172 @@
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from typing import List, Optional, Sequence
+
+from corpus import Segment
+
+# Configuration
+INDEX_CACHE_DIR = os.getenv('INDEX_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'llama32-index'))
+INDEX_CACHE_MAX_BYTES = int(os.getenv('INDEX_CACHE_MAX_BYTES', 1024 ** 3))  # 1 GB
+INDEX_CACHE_MAX_AGE = float(os.getenv('INDEX_CACHE_MAX_AGE', 30 * 24 * 3600))  # 30 days
+
+def file_digest(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ChunkTable(Sequence):
+    """Read-only chunk list backed by a memory-mapped text blob and offset table."""
+
+    def __init__(self, data, offsets: np.ndarray):
+        self._data = data
+        self._offsets = offsets
+
+    @classmethod
+    def open(cls, directory: str) -> "ChunkTable":
+        offsets = np.load(os.path.join(directory, 'offsets.npy'), mmap_mode='r')
+        with open(os.path.join(directory, 'chunks.bin'), 'rb') as f:
+            # mmap refuses empty files; an empty table needs no backing store
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if offsets[-1] else b''
+        return cls(data, offsets)
+
+    @staticmethod
+    def write(directory: str, chunks: List[str]):
+        encoded = [chunk.encode('utf-8') for chunk in chunks]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        with open(os.path.join(directory, 'chunks.bin'), 'wb') as f:
+            f.writelines(encoded)
+        np.save(os.path.join(directory, 'offsets.npy'), offsets)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("chunk index out of range")
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return self._data[start:end].decode('utf-8')
+
+class IndexStore:
+    """Content-hash keyed on-disk cache of document segments, bounded by size and age."""
+
+    def __init__(self, root: str = INDEX_CACHE_DIR, max_bytes: int = INDEX_CACHE_MAX_BYTES,
+                 max_age: float = INDEX_CACHE_MAX_AGE):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, path: str, **config) -> str:
+        """Cache key for a file's contents plus the settings used to index it."""
+        digest = hashlib.sha256(file_digest(path).encode())
+        digest.update(json.dumps(config, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def load(self, key: str) -> Optional[Segment]:
+        """Return the cached segment for key, or None on a miss."""
+        directory = self._entry(key)
+        if not os.path.isdir(directory):
+            return None
+        try:
+            counts = sp.load_npz(os.path.join(directory, 'counts.npz'))
+            chunks = ChunkTable.open(directory)
+            vectors_path = os.path.join(directory, 'vectors.npy')
+            # Embeddings stay on disk and are paged in as searches touch them
+            vectors = np.load(vectors_path, mmap_mode='r') if os.path.exists(vectors_path) else None
+            table = self._load_table(directory)
+            pages_path = os.path.join(directory, 'pages.npy')
+            pages = np.load(pages_path) if os.path.exists(pages_path) else None
+        except (OSError, ValueError, KeyError):
+            # A partial or stale entry is treated as a miss and rebuilt
+            shutil.rmtree(directory, ignore_errors=True)
+            return None
+        os.utime(directory)  # Mark as recently used for eviction
+        return Segment(key, chunks, counts, vectors, table, pages)
+
+    def save(self, segment: Segment):
+        """Persist a segment under its key, then evict old entries."""
+        key = segment.key
+        # Write into a scratch directory and rename so readers never see a partial entry
+        tmp = tempfile.mkdtemp(dir=self.root, prefix='.tmp-')
+        try:
+            sp.save_npz(os.path.join(tmp, 'counts.npz'), segment.counts, compressed=True)
+            ChunkTable.write(tmp, list(segment.chunks))
+            if segment.vectors is not None:
+                np.save(os.path.join(tmp, 'vectors.npy'), segment.vectors)
+            if segment.table is not None:
+                self._save_table(tmp, segment.table)
+            if segment.pages is not None:
+                np.save(os.path.join(tmp, 'pages.npy'), segment.pages)
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            try:
+                os.replace(tmp, self._entry(key))
+            except OSError:
+                # Another session saved the same key in between; keys are content hashes, so its entry is ours too
+                if not os.path.exists(os.path.join(self._entry(key), 'counts.npz')):
+                    raise
+                shutil.rmtree(tmp, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self.evict()
+
+    @staticmethod
+    def _load_table(directory: str):
+        path = os.path.join(directory, 'table.parquet')
+        if not os.path.exists(path):
+            return None
+        try:
+            return pd.read_parquet(path)
+        except ImportError:
+            return None  # No parquet engine installed; the caller re-reads the source file
+
+    @staticmethod
+    def _save_table(directory: str, table: pd.DataFrame):
+        path = os.path.join(directory, 'table.parquet')
+        try:
+            table.to_parquet(path)
+        except (ImportError, ValueError, TypeError):
+            # No parquet engine, or a mixed-type column it cannot store: the table is re-read from the upload instead
+            if os.path.exists(path):
+                os.remove(path)
+
+    def evict(self):
+        """Drop entries older than max_age, then least recently used ones until under max_bytes."""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.root):
+            directory = os.path.join(self.root, name)
+            if name.startswith('.tmp-') or not os.path.isdir(directory):
+                continue
+            last_used = os.path.getmtime(directory)
+            if now - last_used > self.max_age:
+                shutil.rmtree(directory, ignore_errors=True)
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+            entries.append((last_used, size, directory))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, directory in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(directory, ignore_errors=True)
+            total -= size
@@ -0,0 +1,198 @@
+import itertools
+import multiprocessing
+import os
+import threading
+import numpy as np
+import openpyxl
+import pandas as pd
+import PyPDF2
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from chunking import iter_section_chunks
+
+ROWS_PER_BATCH = 10_000  # Spreadsheet rows held in memory at once while streaming
+PDF_PAGES_PER_TASK = 16  # Pages each extraction worker handles per task
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', os.cpu_count() or 1))
+
+def serialize_rows(df: pd.DataFrame) -> List[str]:
+    """Render each row of an already-cleaned DataFrame as an "Entry N" block, one column at a time."""
+    if df.empty:
+        return []
+
+    # df.values applies the same dtype upcasting iterrows does, so cells render identically
+    values = df.values
+    if values.dtype.kind in 'mM':
+        # Keep the Timestamp/Timedelta scalars a row Series would hand out
+        values = df.astype(object).values
+    present = pd.notna(values)  # Null mask computed once for the whole frame
+
+    # One row of pieces per entry: the header, then one "col: value" line per non-null cell
+    pieces = np.full((len(df), len(df.columns) + 1), '', dtype=object)
+    pieces[:, 0] = [f"Entry {idx + 1}:\n" for idx in df.index]
+    for j, col in enumerate(df.columns):
+        mask = present[:, j]
+        pieces[mask, j + 1] = [f"{col}: {value}\n" for value in values[mask, j]]
+
+    return ["".join(row) for row in pieces.tolist()]
+
+def process_dataframe(df: pd.DataFrame) -> str:
+    """Convert DataFrame to structured text format."""
+    # Drop empty columns and rows
+    df = df.dropna(how='all', axis=1).dropna(how='all', axis=0)
+
+    # Add column names as context
+    columns_desc = "Columns: " + ", ".join(df.columns.astype(str))
+    return "\n\n".join([columns_desc] + serialize_rows(df))
+
+def iter_xlsx_frames(path: str, batch_size: int = ROWS_PER_BATCH) -> Iterator[pd.DataFrame]:
+    """Stream the first worksheet of an .xlsx file as DataFrames of at most batch_size rows."""
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [f"Unnamed: {i}" if name is None else name for i, name in enumerate(header)]
+        width = len(columns)
+
+        start = 0
+        while True:
+            batch = [row[:width] + (None,) * (width - len(row)) for row in itertools.islice(rows, batch_size)]
+            if not batch:
+                break
+            yield pd.DataFrame(batch, columns=columns, index=pd.RangeIndex(start, start + len(batch)))
+            start += len(batch)
+    finally:
+        workbook.close()
+
+def iter_frames(path: str, batch_size: int = ROWS_PER_BATCH) -> Iterator[pd.DataFrame]:
+    """Stream a spreadsheet as DataFrames whose index continues across batches."""
+    file_ext = path.split('.')[-1].lower()
+    if file_ext == 'csv':
+        yield from pd.read_csv(path, chunksize=batch_size)
+    elif file_ext == 'xlsx':
+        yield from iter_xlsx_frames(path, batch_size)
+    elif file_ext == 'xls':
+        # Legacy .xls has no streaming reader; load it once and hand it out in slices
+        df = pd.read_excel(path)
+        for start in range(0, len(df), batch_size):
+            yield df.iloc[start:start + batch_size]
+    else:
+        raise ValueError(f"Unsupported file type: {file_ext}")
+
+def iter_spreadsheet_sections(path: str, batch_size: int = ROWS_PER_BATCH) -> Iterator[Tuple[str, int]]:
+    """Yield (section, rows read so far) for a spreadsheet, one batch of rows in memory at a time."""
+    rows_read = 0
+    for batch_number, df in enumerate(iter_frames(path, batch_size)):
+        if batch_number == 0:
+            # Add column names as context
+            yield "Columns: " + ", ".join(df.columns.astype(str)), 0
+        rows_read += len(df)
+        for section in serialize_rows(df.dropna(how='all', axis=1).dropna(how='all', axis=0)):
+            yield section, rows_read
+
+def _extract_page_range(path: str, start: int, end: int) -> List[str]:
+    """Extract pages [start, end) of a PDF; runs in a worker process with its own reader."""
+    pdf_reader = PyPDF2.PdfReader(path)
+    return [pdf_reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+def pdf_pool() -> ProcessPoolExecutor:
+    """The extraction pool shared by every upload, started on first use.
+
+    Workers are spawned rather than forked: uploads arrive on threads of a multi-threaded server,
+    and forking such a process can deadlock a child on a lock some other thread held.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pdf_pool
+
+def extract_pdf_pages(path: str, workers: Optional[int] = None,
+                      on_progress: Optional[Callable[[int, int], None]] = None) -> List[str]:
+    """Extract the text of every page of a PDF, in page order, spreading page ranges over the process pool.
+
+    on_progress, if given, is called with (pages extracted, page count) as page ranges complete.
+    """
+    global _pdf_pool
+    workers = workers or PDF_WORKERS
+    page_count = len(PyPDF2.PdfReader(path).pages)
+    if workers <= 1 or page_count <= PDF_PAGES_PER_TASK:
+        pages = _extract_page_range(path, 0, page_count)
+        if on_progress is not None:
+            on_progress(page_count, page_count)
+        return pages
+
+    starts = range(0, page_count, PDF_PAGES_PER_TASK)
+    ends = [min(start + PDF_PAGES_PER_TASK, page_count) for start in starts]
+    pool = pdf_pool()
+    try:
+        pages = []
+        for page_range in pool.map(_extract_page_range, itertools.repeat(path), starts, ends):
+            pages.extend(page_range)
+            if on_progress is not None:
+                on_progress(len(pages), page_count)
+        return pages
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool for the next upload
+        with _pdf_pool_lock:
+            if _pdf_pool is pool:
+                _pdf_pool = None
+        raise
+
+def extract_text_from_pdf(path: str) -> str:
+    """Extract text from a PDF file."""
+    # A single join avoids re-copying the text for every page
+    return "".join(extract_pdf_pages(path))
+
+def iter_sections(path: str, on_pdf_progress: Optional[Callable[[int, int], None]] = None) -> Iterator[Tuple[str, int]]:
+    """Yield (section, rows read so far) for a spreadsheet, or (section, page number) for a PDF.
+
+    A PDF's pages are all extracted before its first section; on_pdf_progress follows that phase.
+    """
+    file_ext = path.split('.')[-1].lower()
+    if file_ext == 'pdf':
+        for page_number, text in enumerate(extract_pdf_pages(path, on_progress=on_pdf_progress), start=1):
+            for section in text.split('\n\n'):
+                yield section, page_number
+    else:
+        yield from iter_spreadsheet_sections(path)
+
+def stream_chunks(path: str, chunk_size: int = 1000, overlap: int = 100,
+                  on_pdf_progress: Optional[Callable[[int, int], None]] = None
+                  ) -> Iterator[Tuple[str, int, Optional[Tuple[int, int]]]]:
+    """Yield (chunk, rows or pages read so far, (first page, last page) or None) straight from the file.
+
+    The full text is never built. Page spans are only known for PDFs; spreadsheet chunks carry
+    their "Entry N" numbers in the text itself. on_pdf_progress is passed to extract_pdf_pages.
+    """
+    is_pdf = path.split('.')[-1].lower() == 'pdf'
+    progress = [0]
+    section_starts = deque()  # (offset in the joined text, page) of sections the next chunks may touch
+    offset = [0]
+
+    def sections():
+        for section, progress[0] in iter_sections(path, on_pdf_progress):
+            section_starts.append((offset[0], progress[0]))
+            offset[0] += len(section) + 2  # Sections are joined with a blank line
+            yield section
+
+    for chunk, start, end in iter_section_chunks(sections(), chunk_size, overlap):
+        pages = None
+        if is_pdf:
+            # Chunks start in order, so sections wholly before this one are done with
+            while len(section_starts) > 1 and section_starts[1][0] <= start:
+                section_starts.popleft()
+            last_page = section_starts[0][1]
+            for section_start, page in section_starts:
+                if section_start >= end:
+                    break
+                last_page = page
+            pages = (section_starts[0][1], last_page)
+        yield chunk, progress[0], pages
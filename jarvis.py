@@ -1,80 +1,61 @@
-import cv2
 import speech_recognition as sr
 import pyttsx3
-import base64
-from openai import OpenAI
-from os import getenv
-import threading
-import time
+from llama_vision import analyze_image
+from llama_vision.camera import FrameSource
+from wakeword import SAMPLE_RATE, WakeWordDetector, template_paths
+import os
 
-# Initialize OpenAI client
-client = OpenAI(
-    base_url="https://api.fireworks.ai/inference/v1", 
-    api_key=getenv("FIREWORKS_API_KEY")
-)
+# Frames per second to capture in the background; 0 reads a frame only when a request needs one
+CAMERA_FPS = float(os.getenv('JARVIS_CAMERA_FPS', 0))
+FRAME_MAX_AGE = float(os.getenv('JARVIS_FRAME_MAX_AGE', 0.5))  # Seconds; older frames are not sent to the model
+WAKE_TEMPLATES = os.getenv('JARVIS_WAKE_TEMPLATES', 'wake_templates')  # Recordings of "Jarvis", made on first run
+WAKE_TEMPLATE_COUNT = 3
+AUDIO_CHUNK = 320  # Samples per microphone read (20 ms)
 
 # Initialize the text-to-speech engine
 engine = pyttsx3.init()
 
-def image_to_base64(image):
-    _, buffer = cv2.imencode('.png', image)
-    return base64.b64encode(buffer).decode('utf-8')
+SYSTEM_MESSAGE = (
+    "You are a helpful AI assistant named Jarvis. Your task is to analyze images and respond to prompts "
+    "about them. Please provide informative and engaging responses based on what you see in the image. "
+    "If you're unsure about something, it's okay to say so, but try to offer relevant observations or "
+    "suggestions when possible. Avoid mentioning personal boundaries or discomfort unless the request "
+    "is clearly inappropriate."
+)
 
 def process_image(image, prompt):
-    image_base64 = image_to_base64(image)
-    system_message = (
-        "You are a helpful AI assistant named Jarvis. Your task is to analyze images and respond to prompts "
-        "about them. Please provide informative and engaging responses based on what you see in the image. "
-        "If you're unsure about something, it's okay to say so, but try to offer relevant observations or "
-        "suggestions when possible. Avoid mentioning personal boundaries or discomfort unless the request "
-        "is clearly inappropriate."
-    )
-    result = client.chat.completions.create(
-        model="accounts/fireworks/models/llama-v3p2-90b-vision-instruct",
-        messages=[
-            {"role": "system", "content": system_message},
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": prompt
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/png;base64,{image_base64}"
-                        }
-                    }
-                ]
-            }
-        ],
-    )
-    return result.choices[0].message.content
+    return analyze_image(image, prompt, system=SYSTEM_MESSAGE)
 
 def speak(text):
     engine.say(text)
     engine.runAndWait()
 
-def listen_for_wake_word(recognizer, microphone):
-    while True:
-        try:
-            with microphone as source:
-                recognizer.adjust_for_ambient_noise(source)
-                audio = recognizer.listen(source, timeout=5, phrase_time_limit=3)
-                text = recognizer.recognize_google(audio).lower()
-                if "jarvis" in text:
-                    return True
-        except sr.WaitTimeoutError:
-            pass
-        except sr.UnknownValueError:
-            pass
-        except sr.RequestError:
-            print("Could not find results from speech recognition service")
+def record_wake_templates(recognizer, microphone, directory):
+    """Record a few utterances of the wake word to match against (first run only)."""
+    os.makedirs(directory, exist_ok=True)
+    speak(f"Let's set up my wake word. Please say Jarvis {WAKE_TEMPLATE_COUNT} times, pausing after each one.")
+    with microphone as source:
+        for i in range(WAKE_TEMPLATE_COUNT):
+            print(f"Say 'Jarvis' ({i + 1}/{WAKE_TEMPLATE_COUNT})")
+            audio = recognizer.listen(source, phrase_time_limit=2)
+            with open(os.path.join(directory, f"jarvis-{i + 1}.wav"), 'wb') as f:
+                f.write(audio.get_wav_data(convert_rate=SAMPLE_RATE, convert_width=2))
+
+def calibrate_wake_word(detector, microphone):
+    """Measure the room's noise floor once, from a second of audio."""
+    with microphone as source:
+        detector.calibrate(b"".join(source.stream.read(AUDIO_CHUNK) for _ in range(SAMPLE_RATE // AUDIO_CHUNK)))
+
+def listen_for_wake_word(detector, microphone):
+    """Block until the wake word is heard; audio is matched on this machine, in 20 ms steps."""
+    detector.reset()
+    with microphone as source:
+        while True:
+            if detector.process(source.stream.read(AUDIO_CHUNK)):
+                return True
 
 def get_voice_input(recognizer, microphone):
     with microphone as source:
-        recognizer.adjust_for_ambient_noise(source)
         audio = recognizer.listen(source)
     try:
         return recognizer.recognize_google(audio)
@@ -85,38 +66,40 @@ def get_voice_input(recognizer, microphone):
         speak("Sorry, there was an error with the speech recognition service.")
         return None
 
-def camera_thread(frame_buffer):
-    cap = cv2.VideoCapture(0)
-    while True:
-        ret, frame = cap.read()
-        if ret:
-            frame_buffer[0] = frame
-        time.sleep(0.1)  # Reduce CPU usage
-    cap.release()
-
 def main():
     recognizer = sr.Recognizer()
-    microphone = sr.Microphone()
-    frame_buffer = [None]
-
-    # Start camera thread
-    threading.Thread(target=camera_thread, args=(frame_buffer,), daemon=True).start()
+    microphone = sr.Microphone(sample_rate=SAMPLE_RATE, chunk_size=AUDIO_CHUNK)
+    # Calibrated once; the recognizer keeps adapting its energy threshold as it listens
+    with microphone as source:
+        recognizer.adjust_for_ambient_noise(source)
+    if not template_paths(WAKE_TEMPLATES):
+        record_wake_templates(recognizer, microphone, WAKE_TEMPLATES)
+    detector = WakeWordDetector.from_directory(WAKE_TEMPLATES)
+    calibrate_wake_word(detector, microphone)
+    camera = FrameSource(0, fps=CAMERA_FPS or None, on_demand=not CAMERA_FPS).start()
 
     speak("Hello, I'm Jarvis. Say my name when you need me.")
 
-    while True:
-        if listen_for_wake_word(recognizer, microphone):
-            speak("How can I help you?")
-            prompt = get_voice_input(recognizer, microphone)
-            if prompt:
-                speak("Processing your request. Please wait.")
-                if frame_buffer[0] is not None:
-                    response = process_image(frame_buffer[0], prompt)
-                    speak("Here's what I found:")
-                    speak(response)
-                else:
-                    speak("I'm sorry, but I couldn't capture an image. Please try again.")
-            speak("Is there anything else I can help you with?")
+    try:
+        while True:
+            if listen_for_wake_word(detector, microphone):
+                speak("How can I help you?")
+                prompt = get_voice_input(recognizer, microphone)
+                if prompt:
+                    speak("Processing your request. Please wait.")
+                    frame, _, _ = camera.snapshot(max_age=FRAME_MAX_AGE)
+                    if frame is not None:
+                        response = process_image(frame, prompt)
+                        speak("Here's what I found:")
+                        speak(response)
+                    else:
+                        speak("I'm sorry, but I couldn't capture an image. Please try again.")
+                speak("Is there anything else I can help you with?")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        camera.stop()
+        print(f"Camera: {camera.metrics()}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,90 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+# Configuration
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 4))  # Uploads processed at once; the rest queue
+
+class IngestJob:
+    """Handle for one background upload: progress text, completion and cancellation."""
+
+    def __init__(self, session_id: str, document: str):
+        self.session_id = session_id
+        self.document = document
+        self._status = "Queued..."  # Until a worker picks the job up
+        self.future = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def status(self) -> str:
+        return self._status
+
+    @status.setter
+    def status(self, text: str):
+        # Progress reported after a cancel must not hide why the job stopped
+        with self._lock:
+            if not self.cancelled:
+                self._status = text
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self, reason: str = "replaced by a newer upload of the same file"):
+        with self._lock:
+            self._cancelled.set()
+            self._status = f"Cancelled: {reason}."
+        if self.future is not None:
+            self.future.cancel()  # Only succeeds if the job has not started yet
+
+    def publish(self, fn: Callable, *args) -> bool:
+        """Run fn unless the job was cancelled; a concurrent cancel() waits for it to finish."""
+        with self._lock:
+            if self.cancelled:
+                return False
+            fn(*args)
+            return True
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block up to timeout seconds; True once the job has finished or been cancelled."""
+        done, _ = wait([self.future], timeout=timeout)
+        return bool(done) or self.cancelled
+
+class IngestPool:
+    """Bounded pool running uploads in the background, at most one live job per session and document.
+
+    A session can ingest several documents at once; only re-uploading the same document (or
+    removing it) cancels the job already working on it.
+    """
+
+    def __init__(self, max_workers: int = INGEST_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingest')
+        self._jobs = {}  # (session id, document key) -> latest job
+        self._lock = threading.Lock()
+
+    def submit(self, session_id: str, document: str, fn: Callable, *args) -> IngestJob:
+        """Start fn(job, *args) in the background, cancelling an earlier upload of the same document."""
+        job = IngestJob(session_id, document)
+        with self._lock:
+            previous = self._jobs.get((session_id, document))
+            if previous is not None:
+                previous.cancel()
+            self._jobs[(session_id, document)] = job
+            job.future = self._executor.submit(fn, job, *args)
+        job.future.add_done_callback(lambda _: self._forget(job))
+        return job
+
+    def _forget(self, job: IngestJob):
+        with self._lock:
+            if self._jobs.get((job.session_id, job.document)) is job:
+                del self._jobs[(job.session_id, job.document)]
+
+    def cancel(self, session_id: str, document: Optional[str] = None, reason: str = "the session ended"):
+        """Cancel one document's upload, or every upload of the session when document is None."""
+        with self._lock:
+            keys = [key for key in self._jobs if key[0] == session_id and document in (None, key[1])]
+            jobs = [self._jobs.pop(key) for key in keys]
+        for job in jobs:
+            job.cancel(reason)
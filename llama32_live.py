@@ -1,101 +1,68 @@
 import cv2
-import base64
-from openai import OpenAI
-from os import getenv
-import numpy as np
-
-# Initialize OpenAI client
-client = OpenAI(
-    base_url="https://api.fireworks.ai/inference/v1", 
-    api_key=getenv("FIREWORKS_API_KEY")
-)
-
-def image_to_base64(image):
-    _, buffer = cv2.imencode('.png', image)
-    return base64.b64encode(buffer).decode('utf-8')
-
-def process_image(image, prompt):
-    image_base64 = image_to_base64(image)
-    result = client.chat.completions.create(
-        model="accounts/fireworks/models/llama-v3p2-90b-vision-instruct",
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": prompt
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/png;base64,{image_base64}"
-                        }
-                    }
-                ]
-            }
-        ],
-    )
-    return result.choices[0].message.content
+from llama_vision.live import FrameTimer, InferenceWorker, InfoOverlay
 
 def main():
     cap = cv2.VideoCapture(0)
     captured_image = None
     prompt = ""
     response = ""
+    worker = InferenceWorker()  # The model call runs here, so the preview keeps updating meanwhile
+    timer = FrameTimer()
+    overlay = InfoOverlay()  # One canvas, redrawn only when its text changes
 
     print("Controls:")
     print("Press 'c' to capture an image")
     print("Press 'p' to enter a prompt")
-    print("Press 'r' to process the image")
+    print("Press 'r' to process the image (again to replace a pending request, 'x' to cancel it)")
     print("Press 'q' to quit")
 
     while True:
+        timer.tick()
         ret, frame = cap.read()
         if not ret:
             print("Failed to grab frame")
             break
 
+        result = worker.poll()
+        if result is not None:
+            response = f"Error: {result.error}" if result.error else result.response
+            print(f"Response received in {result.elapsed:.1f}s!")
+
         # Display the resulting frame
         cv2.imshow('Camera Feed', frame)
 
-        # Display captured image if available
-        if captured_image is not None:
-            cv2.imshow('Captured Image', captured_image)
-
         # Display prompt and response
-        info = np.zeros((200, 3000, 3), np.uint8)
-        cv2.putText(info, f"Prompt: {prompt}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        cv2.putText(info, f"Response:", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        
-        # Split response into multiple lines
-        y = 90
-        for line in response.split('\n'):
-            cv2.putText(info, line, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
-            y += 20
-            if y > 180:
-                break
-
-        cv2.imshow('Info', info)
+        waited = worker.in_flight_seconds
+        status = f"Processing{'.' * (int(waited * 2) % 4)} {waited:.0f}s | " if waited is not None else ""
+        footer = (f"{status}{timer.fps:.0f} fps, worst frame {timer.recent_worst_ms:.0f} ms, "
+                  f"text render {overlay.body_render_ms:.1f} ms")
+        if overlay.render(prompt, response, footer):
+            cv2.imshow('Info', overlay.canvas)  # The window keeps showing the last image otherwise
 
         key = cv2.waitKey(1) & 0xFF
         if key == ord('q'):
             break
         elif key == ord('c'):
             captured_image = frame.copy()
+            cv2.imshow('Captured Image', captured_image)
             print("Image captured!")
         elif key == ord('p'):
             prompt = input("Enter your prompt: ")
         elif key == ord('r'):
             if captured_image is not None and prompt:
                 print("Processing image...")
-                response = process_image(captured_image, prompt)
-                print("Response received!")
+                worker.submit(captured_image, prompt)
             else:
                 print("Please capture an image and enter a prompt first.")
+        elif key == ord('x') and worker.busy:
+            worker.cancel()
+            print("Request cancelled.")
 
+    worker.close()
     cap.release()
     cv2.destroyAllWindows()
+    print(f"Frame times: {timer.summary()}")
+    print(f"Overlay: {overlay.summary()}")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
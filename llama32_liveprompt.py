@@ -1,46 +1,34 @@
 import cv2
-import base64
-from openai import OpenAI
-from os import getenv
-import time
+from llama_vision.camera import FrameSource
+from llama_vision.live import InferenceWorker
+import os
+import queue
+import threading
 
-# Initialize OpenAI client
-client = OpenAI(
-    base_url="https://api.fireworks.ai/inference/v1", 
-    api_key=getenv("FIREWORKS_API_KEY")
-)
+SAVE_CAPTURES = os.getenv('SAVE_CAPTURES', '1') != '0'  # Also write each capture to captured_image.png
 
-def image_to_base64(image):
-    _, buffer = cv2.imencode('.png', image)
-    return base64.b64encode(buffer).decode('utf-8')
+def read_commands(commands: queue.Queue):
+    """Read menu choices (and the prompt after choice 2) from the terminal, off the display loop."""
+    while True:
+        try:
+            choice = input("\nEnter your choice (1-4): ").strip()
+            commands.put((choice, input("Enter your prompt: ") if choice == '2' else None))
+        except EOFError:
+            commands.put(('4', None))
+            return
+        if choice == '4':
+            return
 
-def process_image(image, prompt):
-    image_base64 = image_to_base64(image)
-    result = client.chat.completions.create(
-        model="accounts/fireworks/models/llama-v3p2-90b-vision-instruct",
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": prompt
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/png;base64,{image_base64}"
-                        }
-                    }
-                ]
-            }
-        ],
-    )
-    return result.choices[0].message.content
+def save_capture(image):
+    # Written on a separate thread so encoding the PNG never stalls the preview
+    threading.Thread(target=cv2.imwrite, args=('captured_image.png', image)).start()
 
 def main():
-    cap = cv2.VideoCapture(0)
+    camera = FrameSource(0).start()
+    worker = InferenceWorker()
+    commands = queue.Queue()
     captured_image = None
+    prompt = None
 
     print("Camera feed opened. Press 'q' in the camera window to close it.")
     print("\nInstructions:")
@@ -48,45 +36,60 @@ def main():
     print("2. Enter a prompt")
     print("3. Process the image")
     print("4. Quit the program")
+    threading.Thread(target=read_commands, args=(commands,), daemon=True).start()
 
     while True:
-        ret, frame = cap.read()
-        if not ret:
+        frame, _, _ = camera.latest()  # Zero-copy; imshow copies it into the window
+        if camera.failed:
             print("Failed to grab frame")
             break
+        if frame is not None:
+            cv2.imshow('Camera Feed', frame)
 
-        cv2.imshow('Camera Feed', frame)
-
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        if cv2.waitKey(15) & 0xFF == ord('q'):
             break
 
-        choice = input("\nEnter your choice (1-4): ")
+        result = worker.poll()
+        if result is not None:
+            print("\nModel Response:")
+            print(f"Error: {result.error}" if result.error else result.response)
+
+        try:
+            choice, text = commands.get_nowait()
+        except queue.Empty:
+            continue
 
         if choice == '1':
-            captured_image = frame.copy()
-            cv2.imwrite('captured_image.png', captured_image)
-            print("Image captured and saved as 'captured_image.png'")
+            captured, _, age = camera.snapshot()  # A private copy, since the camera reuses its frame buffers
+            if captured is None:
+                print("No frame from the camera yet.")
+                continue
+            captured_image = captured
+            if SAVE_CAPTURES:
+                save_capture(captured_image)
+                print(f"Image captured ({age * 1000:.0f} ms old) and saved as 'captured_image.png'")
+            else:
+                print(f"Image captured ({age * 1000:.0f} ms old)")
         elif choice == '2':
             if captured_image is None:
                 print("Please capture an image first.")
             else:
-                prompt = input("Enter your prompt: ")
+                prompt = text
         elif choice == '3':
-            if captured_image is None or 'prompt' not in locals():
+            if captured_image is None or prompt is None:
                 print("Please capture an image and enter a prompt first.")
             else:
                 print("Processing image...")
-                response = process_image(captured_image, prompt)
-                print("\nModel Response:")
-                print(response)
+                worker.submit(captured_image, prompt)
         elif choice == '4':
             print("Exiting program.")
             break
         else:
             print("Invalid choice. Please enter a number between 1 and 4.")
 
-    cap.release()
+    worker.close()
+    camera.stop()
     cv2.destroyAllWindows()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
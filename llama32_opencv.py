@@ -1,7 +1,5 @@
 import cv2
-import base64
-from openai import OpenAI
-from os import getenv
+from llama_vision import analyze_image
 import time
 
 def list_available_cameras():
@@ -65,16 +63,7 @@ def capture_image():
     cv2.destroyAllWindows()
     return 'screenshot.jpg'
 
-def image_to_base64(image_path):
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
-
 def main():
-    client = OpenAI(
-        base_url="https://api.fireworks.ai/inference/v1", 
-        api_key=getenv("FIREWORKS_API_KEY")
-    )
-
     # Capture image from camera
     try:
         image_path = capture_image()
@@ -88,32 +77,11 @@ def main():
     # Get user input for the prompt
     user_prompt = input("Enter your prompt for the image: ")
 
-    # Convert image to base64
-    image_base64 = image_to_base64(image_path)
-
-    result = client.chat.completions.create(
-        model="accounts/fireworks/models/llama-v3p2-90b-vision-instruct",
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": user_prompt
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{image_base64}"
-                        }
-                    }
-                ]
-            }
-        ],
-    )
+    # The saved JPEG is sent as-is
+    response = analyze_image(image_path, user_prompt)
 
     # Print the model's response
-    print(result.choices[0].message.content)
+    print(response)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,10 @@
+from llama_vision.analyze import aanalyze_image, analyze_image, image_messages
+from llama_vision.cache import ResultCache, get_cache
+from llama_vision.client import MODEL, ClientStats, DeadlineExceeded, VisionClient, get_client
+from llama_vision.images import ImageEncoder, image_to_base64, image_url
+from llama_vision.ratelimit import TokenBucket
+
+__all__ = [
+    'MODEL', 'ClientStats', 'DeadlineExceeded', 'ImageEncoder', 'ResultCache', 'TokenBucket', 'VisionClient',
+    'aanalyze_image', 'analyze_image', 'get_cache', 'get_client', 'image_messages', 'image_to_base64', 'image_url',
+]
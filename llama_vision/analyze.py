@@ -0,0 +1,71 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from llama_vision.cache import ResultCache, get_cache, perceptual_hash
+from llama_vision.client import MODEL, VisionClient, get_client
+from llama_vision.images import Image, ImageEncoder, image_url
+
+def image_messages(prompt: str, url: str, system: Optional[str] = None) -> List[Dict]:
+    """Chat messages asking prompt about the image at url, with an optional system message."""
+    messages = [{"role": "system", "content": system}] if system else []
+    messages.append({
+        "role": "user",
+        "content": [
+            {"type": "text", "text": prompt},
+            {"type": "image_url", "image_url": {"url": url}},
+        ]
+    })
+    return messages
+
+def _lookup(cache: Optional[ResultCache], image: Image, url: str, prompt: str, system: Optional[str], model: str,
+            response_model, options: Dict):
+    """(key, perceptual hash, cached result) for a request; the hash is only computed for near matching."""
+    if cache is None:
+        return None, None, None
+    key = cache.key(url, prompt, system, model, response_model, **options)
+    phash = perceptual_hash(image) if cache.phash_distance is not None else None
+    return key, phash, cache.get(key, response_model, phash)
+
+def analyze_image(image: Image, prompt: str, system: Optional[str] = None, response_model=None,
+                  model: str = MODEL, client: Optional[VisionClient] = None, encoder: Optional[ImageEncoder] = None,
+                  use_cache: bool = True, **kwargs):
+    """Ask the vision model about one image.
+
+    Returns the reply text, or an instance of response_model (a pydantic model) when given.
+    image may be an OpenCV frame, encoded bytes, a file path or a URL; frames are downscaled and
+    compressed by encoder (default settings from the VISION_IMAGE_* variables). Replies are cached
+    on disk by image, prompt, model and schema unless use_cache is False or VISION_CACHE=0.
+    """
+    client = client or get_client()
+    cache = get_cache() if use_cache else None
+    url = image_url(image, encoder)
+    key, phash, cached = _lookup(cache, image, url, prompt, system, model, response_model, kwargs)
+    if cached is not None:
+        return cached
+    messages = image_messages(prompt, url, system)
+    if response_model is not None:
+        result = client.structured(response_model, messages, model=model, **kwargs)
+    else:
+        result = client.chat(messages, model=model, **kwargs).choices[0].message.content
+    if cache is not None:
+        cache.put(key, result, response_model, phash)
+    return result
+
+async def aanalyze_image(image: Image, prompt: str, system: Optional[str] = None, response_model=None,
+                         model: str = MODEL, client: Optional[VisionClient] = None, encoder: Optional[ImageEncoder] = None,
+                         use_cache: bool = True, **kwargs):
+    """Async analyze_image; encoding the image and cache reads and writes run in worker threads."""
+    client = client or get_client()
+    cache = get_cache() if use_cache else None
+    url = await asyncio.to_thread(image_url, image, encoder)
+    key, phash, cached = await asyncio.to_thread(_lookup, cache, image, url, prompt, system, model, response_model, kwargs)
+    if cached is not None:
+        return cached
+    messages = image_messages(prompt, url, system)
+    if response_model is not None:
+        result = await client.astructured(response_model, messages, model=model, **kwargs)
+    else:
+        result = (await client.achat(messages, model=model, **kwargs)).choices[0].message.content
+    if cache is not None:
+        await asyncio.to_thread(cache.put, key, result, response_model, phash)
+    return result
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Configuration
+CACHE_ENABLED = os.getenv('VISION_CACHE', '1') != '0'
+CACHE_DIR = os.getenv('VISION_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'llama32-vision'))
+CACHE_MAX_BYTES = int(os.getenv('VISION_CACHE_MAX_BYTES', 256 * 1024 ** 2))  # 256 MB
+CACHE_MAX_ENTRIES = int(os.getenv('VISION_CACHE_MAX_ENTRIES', 10_000))
+# Max differing bits (of 64) between perceptual hashes for a near-duplicate hit; unset disables near matching
+CACHE_PHASH_DISTANCE = int(os.environ['VISION_CACHE_PHASH_DISTANCE']) if os.getenv('VISION_CACHE_PHASH_DISTANCE') else None
+PHASH_INDEX = 'phashes.idx'  # Per-scope "<image digest> <perceptual hash>" lines, appended on every put
+
+def schema_name(response_model) -> Optional[str]:
+    return f"{response_model.__module__}:{response_model.__qualname__}" if response_model is not None else None
+
+def perceptual_hash(image) -> Optional[int]:
+    """64-bit difference hash of a frame, encoded bytes or image file; None when it cannot be decoded.
+
+    Each bit says whether a pixel of a 9x8 grayscale thumbnail is brighter than its right-hand
+    neighbour, so re-encoding, small shifts in exposure and sensor noise leave most bits unchanged.
+    """
+    import cv2
+    import numpy as np
+    if isinstance(image, bytes):
+        image = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_GRAYSCALE)
+    elif isinstance(image, str):
+        image = None if image.startswith(('http://', 'https://', 'data:')) else cv2.imread(image, cv2.IMREAD_GRAYSCALE)
+    elif image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if image is None:
+        return None
+    small = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(small[:, 1:] > small[:, :-1]).tobytes(), 'big')
+
+def raw_reply(result) -> str:
+    """Reply text behind a result: the text itself, or the completion instructor parsed the model from."""
+    if isinstance(result, str):
+        return result
+    completion = getattr(result, '_raw_response', None)
+    try:
+        return completion.choices[0].message.content
+    except (AttributeError, IndexError):
+        return result.model_dump_json()
+
+class ResultCache:
+    """Content-addressed on-disk cache of vision model replies, bounded by size and entry count (LRU).
+
+    Entries live at <root>/<scope>/<image digest>.json, where scope hashes everything but the image
+    (prompt, system message, model, response schema and request options) and the image digest
+    hashes the exact payload sent to the model, so an exact hit is a single open(). Both the raw
+    reply and the parsed model are stored. Each scope also keeps a small append-only index of its
+    entries' perceptual hashes; with phash_distance set, a miss falls back to the entry in the same
+    scope whose perceptual hash is closest, so near-identical webcam frames are answered too.
+    """
+
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES, max_entries: int = CACHE_MAX_ENTRIES,
+                 phash_distance: Optional[int] = CACHE_PHASH_DISTANCE):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.phash_distance = phash_distance
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._usage = None  # (bytes, entries) on disk, scanned on the first put
+        self._phashes = {}  # scope -> (index file inode, bytes read, {image digest: perceptual hash})
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(url: str, prompt: str, system: Optional[str], model: str, response_model=None, **options) -> Tuple[str, str]:
+        """(scope, image digest) for a request; url is the image_url payload actually sent."""
+        schema = response_model.model_json_schema() if response_model is not None else None
+        scope = json.dumps([prompt, system, model, schema_name(response_model), schema, options], sort_keys=True, default=str)
+        return hashlib.sha256(scope.encode()).hexdigest()[:32], hashlib.sha256(url.encode()).hexdigest()
+
+    def _path(self, scope: str, digest: str) -> str:
+        return os.path.join(self.root, scope, f"{digest}.json")
+
+    def _scope_phashes(self, scope: str) -> List[Tuple[str, int]]:
+        """(image digest, perceptual hash) of the scope's entries, reading only what was appended since last time."""
+        with self._lock:
+            inode, offset, phashes = self._phashes.get(scope, (None, 0, {}))
+            try:
+                with open(os.path.join(self.root, scope, PHASH_INDEX), 'rb') as f:
+                    stat = os.fstat(f.fileno())
+                    if stat.st_ino != inode:  # New, or rewritten by evict()
+                        inode, offset, phashes = stat.st_ino, 0, {}
+                    f.seek(offset)
+                    data = f.read()
+            except FileNotFoundError:
+                return []
+            complete = data.rfind(b'\n') + 1  # A line still being appended is read next time
+            for line in data[:complete].decode().splitlines():
+                digest, _, phash = line.partition(' ')
+                phashes[digest] = int(phash, 16)
+            self._phashes[scope] = (inode, offset + complete, phashes)
+            return list(phashes.items())
+
+    def _near(self, scope: str, phash: int) -> List[str]:
+        """Digests of the scope's entries within phash_distance of phash, nearest first."""
+        distances = [(bin(phash ^ entry_phash).count('1'), digest) for digest, entry_phash in self._scope_phashes(scope)]
+        return [digest for distance, digest in sorted(distances) if distance <= self.phash_distance]
+
+    @staticmethod
+    def _load(path: str) -> Optional[Dict]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key: Tuple[str, str], response_model=None, phash: Optional[int] = None):
+        """Cached reply for key (text, or a response_model instance), or None on a miss."""
+        scope, digest = key
+        path = self._path(scope, digest)
+        entry = self._load(path)
+        exact = entry is not None
+        if entry is None and phash is not None and self.phash_distance is not None:
+            for near in self._near(scope, phash):
+                path = self._path(scope, near)
+                entry = self._load(path)  # None when evicted since it was indexed
+                if entry is not None:
+                    break
+        if entry is None:
+            self.misses += 1
+            return None
+        try:
+            result = response_model.model_validate(entry['parsed']) if response_model is not None else entry['raw']
+        except (ValueError, KeyError, TypeError):
+            # A stale entry (e.g. the schema changed shape) is a miss and gets rewritten
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # Mark as recently used for eviction
+        except OSError:
+            pass
+        if exact:
+            self.hits += 1
+        else:
+            self.near_hits += 1
+        return result
+
+    def put(self, key: Tuple[str, str], result, response_model=None, phash: Optional[int] = None):
+        scope, digest = key
+        directory = os.path.join(self.root, scope)
+        os.makedirs(directory, exist_ok=True)
+        entry = {
+            'raw': raw_reply(result),
+            'parsed': result.model_dump(mode='json') if response_model is not None else None,
+            'schema': schema_name(response_model),
+            'stored_at': time.time(),
+        }
+        path = self._path(scope, digest)
+        # Write a scratch file and rename so readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            replaced = os.path.exists(path)
+            os.replace(tmp, path)
+        except Exception:
+            os.remove(tmp)
+            raise
+        if phash is not None:
+            # One short O_APPEND write, so concurrent writers never interleave within a line
+            with open(os.path.join(directory, PHASH_INDEX), 'a') as f:
+                f.write(f"{digest} {phash:016x}\n")
+        self._record(os.path.getsize(path), 0 if replaced else 1)
+
+    def _record(self, size: int, entries: int):
+        with self._lock:
+            if self._usage is None:
+                self._usage = self._scan_usage()
+            else:
+                self._usage = (self._usage[0] + size, self._usage[1] + entries)
+            over = self._usage[0] > self.max_bytes or self._usage[1] > self.max_entries
+        if over:
+            self.evict()
+
+    def _entries(self):
+        for scope in os.scandir(self.root):
+            if not scope.is_dir():
+                continue
+            for entry in os.scandir(scope.path):
+                if entry.is_file() and entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    yield stat.st_mtime, stat.st_size, entry.path
+
+    def _scan_usage(self) -> Tuple[int, int]:
+        sizes = [size for _, size, _ in self._entries()]
+        return sum(sizes), len(sizes)
+
+    def evict(self):
+        """Drop least recently used entries until under max_bytes and max_entries."""
+        with self._lock:
+            entries = sorted(self._entries())
+            total, count = sum(size for _, size, _ in entries), len(entries)
+            scopes = set()
+            for _, size, path in entries:
+                if total <= self.max_bytes and count <= self.max_entries:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                scopes.add(os.path.dirname(path))
+                total -= size
+                count -= 1
+            self._usage = (total, count)
+        for directory in scopes:
+            self._compact_index(directory)
+
+    @staticmethod
+    def _compact_index(directory: str):
+        """Rewrite a scope's perceptual-hash index without the entries evicted from it."""
+        index = os.path.join(directory, PHASH_INDEX)
+        try:
+            with open(index) as f:
+                lines = f.read().splitlines(keepends=True)
+        except FileNotFoundError:
+            return
+        kept = {line.partition(' ')[0]: line for line in lines if line.endswith('\n')}
+        kept = [line for digest, line in kept.items() if os.path.exists(os.path.join(directory, f"{digest}.json"))]
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.writelines(kept)
+            os.replace(tmp, index)  # Readers notice the new inode and reread it
+        except Exception:
+            os.remove(tmp)
+            raise
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            'hits': self.hits,
+            'near_hits': self.near_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.near_hits) / lookups if lookups else 0.0,
+        }
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+def get_cache() -> Optional[ResultCache]:
+    """The process-wide result cache, or None when VISION_CACHE=0."""
+    global _default_cache
+    if not CACHE_ENABLED:
+        return None
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = ResultCache()
+    return _default_cache
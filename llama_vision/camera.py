@@ -0,0 +1,180 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+CAMERA_SLOTS = 3  # Frames kept in the ring; a zero-copy frame stays intact for this many captures minus one
+CAMERA_MAX_MISSES = 10  # Consecutive failed reads before the camera counts as gone
+CAMERA_RETRY_DELAY = 0.05  # Seconds between reads after a failed one
+CAMERA_DRAIN_MAX = 8  # Most queued frames skipped before an on-demand or throttled read
+CAMERA_FRESH_SECONDS = 0.005  # A grab that waits longer than this got a new frame rather than a queued one
+
+class FrameSource:
+    """A camera read into a small ring of preallocated frames, with a sequence number per frame.
+
+    With a capture thread (the default), frames are read continuously at the camera's rate, or at
+    most fps per second when given. With on_demand=True there is no thread at all, and a frame is
+    read only when snapshot() is called, so an idle app uses no CPU on the camera. On-demand and
+    throttled reads first skip whatever frames the driver queued since the last read.
+
+    latest() hands out the newest slot without copying or locking. The capture thread reads into
+    the slots in turn, so that frame is overwritten len(slots) - 1 captures later. It is fine for
+    display, but anything that keeps a frame or processes it slowly should use snapshot(). That
+    copies the slot and checks the sequence counters, retrying if the writer reached the slot
+    mid-copy (a seqlock).
+    """
+
+    def __init__(self, source=0, fps: Optional[float] = None, on_demand: bool = False, slots: int = CAMERA_SLOTS):
+        self.source = source
+        self.fps = fps
+        self.on_demand = on_demand
+        self._slots = [None] * slots
+        self._captured_at = [0.0] * slots
+        self._seq = 0  # Sequence number of the newest complete frame; 0 before the first
+        self._writing = 0  # Sequence number of the frame being read into its slot
+        self._new_frame = threading.Condition()
+        self._read_lock = threading.Lock()  # Serializes on-demand reads
+        self._stop = threading.Event()
+        self._thread = None
+        self._capture = None
+        self.failed = False  # Set when the camera stops delivering frames
+        self._misses = 0  # Consecutive failed reads
+        self.served = 0
+        self.total_age = 0.0
+        self.max_age = 0.0
+
+    def start(self) -> "FrameSource":
+        import cv2
+        self._capture = cv2.VideoCapture(self.source)
+        # Keep the driver from queueing frames, so a throttled or on-demand read is not stale (ignored by some
+        # backends, which _read() makes up for by draining the queue)
+        self._capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if not self.on_demand:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _read(self) -> bool:
+        """Read the next frame into the next slot and publish it; False when the read failed."""
+        seq = self._seq + 1
+        index = seq % len(self._slots)
+        self._writing = seq
+        if self.on_demand or self.fps:
+            ret = self._drain()
+            frame = None
+            if ret:
+                ret, frame = self._capture.retrieve(self._slots[index])
+        else:
+            ret, frame = self._capture.read(self._slots[index])  # Reuses the slot's array once it has the right shape
+        if not ret:
+            # A dropped frame is normal; only a closed device or a run of misses means the camera is gone
+            self._misses += 1
+            if self._misses >= CAMERA_MAX_MISSES or not self._capture.isOpened():
+                self.failed = True
+                with self._new_frame:
+                    self._new_frame.notify_all()
+            return False
+        self._misses = 0
+        self._slots[index] = frame
+        self._captured_at[index] = time.monotonic()
+        with self._new_frame:
+            self._seq = seq
+            self._new_frame.notify_all()
+        return True
+
+    def _drain(self) -> bool:
+        """Grab frames until one had to be waited for, so the one retrieved next was just captured.
+
+        Between reads the driver may have queued frames, which grab() returns at once, oldest first.
+        """
+        for _ in range(CAMERA_DRAIN_MAX):
+            started = time.monotonic()
+            if not self._capture.grab():
+                return False
+            if time.monotonic() - started > CAMERA_FRESH_SECONDS:
+                break
+        return True
+
+    def _run(self):
+        interval = 1.0 / self.fps if self.fps else 0.0
+        capture = self._capture  # Released here, by the thread reading from it, whenever stop() gives up waiting
+        try:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                if not self._read():
+                    if self.failed:
+                        break
+                    self._stop.wait(CAMERA_RETRY_DELAY)
+                elif interval:
+                    self._stop.wait(max(0.0, interval - (time.monotonic() - started)))
+        finally:
+            capture.release()
+
+    def latest(self) -> Tuple[Optional[object], int, Optional[float]]:
+        """(frame, sequence number, age in seconds) of the newest frame without copying; (None, 0, None) before the first."""
+        seq = self._seq
+        if seq == 0:
+            return None, 0, None
+        index = seq % len(self._slots)
+        return self._slots[index], seq, time.monotonic() - self._captured_at[index]
+
+    def snapshot(self, max_age: Optional[float] = None, timeout: float = 2.0):
+        """A private copy of the newest frame, as (frame, sequence number, age in seconds).
+
+        With max_age, waits for a frame captured within the last max_age seconds (on demand, one
+        is always read now). Returns (None, 0, None) if no frame arrives before timeout.
+        """
+        if self.on_demand:
+            with self._read_lock:
+                if self._capture is None:  # Stopped
+                    return None, 0, None
+                while not self.failed and not self._read():
+                    time.sleep(CAMERA_RETRY_DELAY)
+                if self.failed:
+                    return None, 0, None
+        deadline = time.monotonic() + timeout
+        while True:
+            frame, seq, age = self.latest()
+            if frame is not None and (max_age is None or age <= max_age):
+                copy = frame.copy()
+                # The writer reaches this slot again len(slots) captures later; if it started, the copy may be torn
+                if self._writing - seq < len(self._slots):
+                    self._record(age)
+                    return copy, seq, age
+                continue
+            with self._new_frame:
+                remaining = deadline - time.monotonic()
+                if self.failed or remaining <= 0:
+                    return None, 0, None
+                self._new_frame.wait_for(lambda: self._seq != seq or self.failed, remaining)
+
+    def _record(self, age: float):
+        self.served += 1
+        self.total_age += age
+        self.max_age = max(self.max_age, age)
+
+    def metrics(self) -> Dict:
+        """Frames captured and served, and the age of served frames at the moment they were taken."""
+        return {
+            'captured': self._seq,
+            'served': self.served,
+            'mean_age_ms': round(self.total_age / self.served * 1000, 1) if self.served else 0.0,
+            'max_age_ms': round(self.max_age * 1000, 1),
+        }
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            # The thread releases the camera once its current read returns, even if that outlasts the join
+            self._thread.join(timeout=2)
+            self._thread = None
+        else:
+            with self._read_lock:
+                if self._capture is not None:
+                    self._capture.release()
+                    self._capture = None
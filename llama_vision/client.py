@@ -0,0 +1,273 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Optional
+
+from llama_vision.ratelimit import TokenBucket, backoff_delay, retry_after
+
+# Configuration
+MODEL = "accounts/fireworks/models/llama-v3p2-90b-vision-instruct"
+BASE_URL = os.getenv('VISION_BASE_URL', "https://api.fireworks.ai/inference/v1")
+RATE_LIMIT = float(os.getenv('VISION_RATE_LIMIT', 5))  # Requests per second, before adapting to the server
+MAX_CONCURRENCY = int(os.getenv('VISION_MAX_CONCURRENCY', 8))  # Requests in flight at once; the rest queue
+REQUEST_TIMEOUT = float(os.getenv('VISION_REQUEST_TIMEOUT', 60))  # Seconds per request, queueing and retries included
+MAX_RETRIES = int(os.getenv('VISION_MAX_RETRIES', 5))
+POOL_CONNECTIONS = int(os.getenv('VISION_POOL_CONNECTIONS', 16))  # Connections kept open to the endpoint
+KEEPALIVE_EXPIRY = float(os.getenv('VISION_KEEPALIVE_EXPIRY', 300))  # Seconds an idle connection stays open
+
+RETRY_STATUSES = {408, 409, 429}  # Plus every 5xx
+
+class DeadlineExceeded(TimeoutError):
+    """A request could not complete (including queueing and retries) before its deadline."""
+
+class ClientStats:
+    """Counters for the request queue and outcomes, safe to update from any thread."""
+
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.queue_wait = 0.0  # Total seconds spent waiting for a concurrency slot
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.deadlines_exceeded = 0
+        self._lock = threading.Lock()
+
+    def add(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+            self.max_queued = max(self.max_queued, self.queued)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            stats = {name: value for name, value in vars(self).items() if not name.startswith('_')}
+        stats['mean_queue_wait'] = stats['queue_wait'] / stats['requests'] if stats['requests'] else 0.0
+        return stats
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  httpx needs it for HTTP/2
+        return True
+    except ImportError:
+        return False
+
+class VisionClient:
+    """OpenAI-compatible client for the vision model with rate limiting, retries, deadlines and a concurrency cap.
+
+    chat() and achat() take the same arguments as chat.completions.create, plus an optional timeout
+    that bounds the whole call. Both share one token bucket and one set of stats; each has its own
+    cap of max_concurrency requests in flight (for achat, per event loop).
+
+    The underlying clients, and the openai/httpx imports, are deferred to the first request. Each
+    keeps a pool of long-lived keep-alive connections (HTTP/2 when h2 is installed), so only the
+    first request to the endpoint pays for the TLS handshake. The async client and its semaphore
+    are bound to the event loop they are created in, so every loop using the client (say, one
+    asyncio.run per call) gets its own pair, dropped once the loop has closed.
+    """
+
+    def __init__(self, base_url: str = BASE_URL, api_key: Optional[str] = None, rate: float = RATE_LIMIT,
+                 max_concurrency: int = MAX_CONCURRENCY, timeout: float = REQUEST_TIMEOUT,
+                 max_retries: int = MAX_RETRIES):
+        self.base_url = base_url
+        self.api_key = api_key or os.getenv("FIREWORKS_API_KEY")
+        self._sync = None
+        self._async_states = {}  # Event loop -> [async client or None, request semaphore]
+        self._init_lock = threading.Lock()
+        self.bucket = TokenBucket(rate)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.stats = ClientStats()
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._structured = {}
+
+    def _limits(self):
+        import httpx
+        return httpx.Limits(max_connections=max(POOL_CONNECTIONS, self.max_concurrency),
+                            max_keepalive_connections=max(POOL_CONNECTIONS, self.max_concurrency),
+                            keepalive_expiry=KEEPALIVE_EXPIRY)
+
+    @property
+    def sync_client(self):
+        if self._sync is None:
+            with self._init_lock:
+                if self._sync is None:
+                    import httpx
+                    from openai import OpenAI
+                    # Retries are handled here, where they can honour the deadline and the shared rate limit
+                    self._sync = OpenAI(base_url=self.base_url, api_key=self.api_key, max_retries=0,
+                                        http_client=httpx.Client(http2=http2_available(), limits=self._limits()))
+        return self._sync
+
+    def _async_state(self) -> list:
+        """[async client or None, request semaphore] of the running event loop, created on its first use."""
+        loop = asyncio.get_running_loop()
+        with self._init_lock:
+            state = self._async_states.get(loop)
+            if state is None:
+                # Whatever a finished loop left behind can no longer be used (or awaited closed)
+                for closed in [other for other in self._async_states if other.is_closed()]:
+                    del self._async_states[closed]
+                state = self._async_states[loop] = [None, asyncio.Semaphore(self.max_concurrency)]
+            return state
+
+    @property
+    def async_client(self):
+        """The async client of the running event loop."""
+        state = self._async_state()
+        if state[0] is None:
+            import httpx
+            from openai import AsyncOpenAI
+            state[0] = AsyncOpenAI(base_url=self.base_url, api_key=self.api_key, max_retries=0,
+                                   http_client=httpx.AsyncClient(http2=http2_available(), limits=self._limits()))
+        return state[0]
+
+    def close(self):
+        if self._sync is not None:
+            self._sync.close()
+            self._sync = None
+
+    async def aclose(self):
+        """Close the running event loop's async client."""
+        state = self._async_states.pop(asyncio.get_running_loop(), None)
+        if state is not None and state[0] is not None:
+            await state[0].close()
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying after error, or None if it should be raised."""
+        from openai import APIConnectionError, APIStatusError, APITimeoutError
+        if isinstance(error, APIStatusError):
+            if error.status_code not in RETRY_STATUSES and error.status_code < 500:
+                return None
+            server_wait = retry_after(error.response.headers)
+            if error.status_code == 429:
+                self.stats.add(throttled=1)
+                self.bucket.throttled(server_wait)
+        elif isinstance(error, (APITimeoutError, APIConnectionError)):
+            server_wait = None
+        else:
+            return None
+        if attempt >= self.max_retries:
+            return None
+        return max(server_wait or 0.0, backoff_delay(attempt))
+
+    @contextmanager
+    def _slot(self, deadline: float):
+        start = time.monotonic()
+        self.stats.add(requests=1, queued=1)
+        acquired = self._slots.acquire(timeout=max(0.0, deadline - start))
+        self.stats.add(queued=-1, queue_wait=time.monotonic() - start)
+        if not acquired:
+            self.stats.add(deadlines_exceeded=1)
+            raise DeadlineExceeded("Timed out waiting for a free request slot")
+        self.stats.add(in_flight=1)
+        try:
+            yield
+        finally:
+            self.stats.add(in_flight=-1)
+            self._slots.release()
+
+    @asynccontextmanager
+    async def _async_slot(self, deadline: float):
+        slots = self._async_state()[1]
+        start = time.monotonic()
+        self.stats.add(requests=1, queued=1)
+        try:
+            await asyncio.wait_for(slots.acquire(), max(0.0, deadline - start))
+        except asyncio.TimeoutError:
+            self.stats.add(deadlines_exceeded=1)
+            raise DeadlineExceeded("Timed out waiting for a free request slot") from None
+        finally:
+            self.stats.add(queued=-1, queue_wait=time.monotonic() - start)
+        self.stats.add(in_flight=1)
+        try:
+            yield
+        finally:
+            self.stats.add(in_flight=-1)
+            slots.release()
+
+    def _check_deadline(self, deadline: float, wait: float, error: Optional[Exception] = None):
+        if time.monotonic() + wait >= deadline:
+            self.stats.add(deadlines_exceeded=1)
+            raise DeadlineExceeded("Request deadline reached") from error
+
+    def chat(self, messages: List[Dict], model: str = MODEL, timeout: Optional[float] = None, **kwargs):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        with self._slot(deadline):
+            attempt = 0
+            while True:
+                wait = self.bucket.reserve()
+                self._check_deadline(deadline, wait)
+                time.sleep(wait)
+                try:
+                    raw = self.sync_client.chat.completions.with_raw_response.create(
+                        model=model, messages=messages, timeout=deadline - time.monotonic(), **kwargs
+                    )
+                except Exception as e:
+                    delay = self._retry_delay(e, attempt)
+                    if delay is None:
+                        self.stats.add(failures=1)
+                        raise
+                    self._check_deadline(deadline, delay, e)
+                    self.stats.add(retries=1)
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                self.bucket.succeeded(raw.headers)
+                return raw.parse()
+
+    async def achat(self, messages: List[Dict], model: str = MODEL, timeout: Optional[float] = None, **kwargs):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        async with self._async_slot(deadline):
+            attempt = 0
+            while True:
+                wait = self.bucket.reserve()
+                self._check_deadline(deadline, wait)
+                await asyncio.sleep(wait)
+                try:
+                    raw = await self.async_client.chat.completions.with_raw_response.create(
+                        model=model, messages=messages, timeout=deadline - time.monotonic(), **kwargs
+                    )
+                except Exception as e:
+                    delay = self._retry_delay(e, attempt)
+                    if delay is None:
+                        self.stats.add(failures=1)
+                        raise
+                    self._check_deadline(deadline, delay, e)
+                    self.stats.add(retries=1)
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                self.bucket.succeeded(raw.headers)
+                return raw.parse()
+
+    def _patched(self, create):
+        """chat/achat wrapped by instructor, so structured output goes through the same limits."""
+        if create not in self._structured:
+            import instructor
+            self._structured[create] = instructor.patch(create=create, mode=instructor.Mode.JSON)
+        return self._structured[create]
+
+    def structured(self, response_model, messages: List[Dict], **kwargs):
+        """Parse the reply into a pydantic model (validation retries are instructor's max_retries)."""
+        return self._patched(self.chat)(response_model=response_model, messages=messages, **kwargs)
+
+    async def astructured(self, response_model, messages: List[Dict], **kwargs):
+        return await self._patched(self.achat)(response_model=response_model, messages=messages, **kwargs)
+
+_default_client = None
+_default_lock = threading.Lock()
+
+def get_client() -> VisionClient:
+    """The process-wide client, so every caller shares one rate limit and connection pool."""
+    global _default_client
+    if _default_client is None:
+        with _default_lock:
+            if _default_client is None:
+                _default_client = VisionClient()
+    return _default_client
@@ -0,0 +1,85 @@
+import base64
+import binascii
+import mimetypes
+import os
+from typing import Any, Optional
+
+# Configuration
+IMAGE_FORMAT = os.getenv('VISION_IMAGE_FORMAT', 'jpeg')  # 'jpeg', 'webp' or 'png' for camera frames
+IMAGE_QUALITY = int(os.getenv('VISION_IMAGE_QUALITY', 85))  # JPEG/WebP quality, 1-100
+IMAGE_MAX_SIDE = int(os.getenv('VISION_IMAGE_MAX_SIDE', 1120))  # Longest side sent; 0 keeps full resolution
+
+Image = Any  # OpenCV frame (numpy array), encoded image bytes, or a file path / URL; numpy is not imported here
+
+MIME_TYPES = {'jpeg': 'image/jpeg', 'webp': 'image/webp', 'png': 'image/png'}
+
+class ImageEncoder:
+    """Turns OpenCV frames into compact data URLs: downscaled, then JPEG/WebP (lossy) or PNG encoded.
+
+    The model resizes images to its own tiles anyway, so pixels beyond max_side mostly add upload
+    time. Base64 is written once, straight from the encoded buffer, into the final URL string.
+    """
+
+    def __init__(self, format: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY, max_side: int = IMAGE_MAX_SIDE):
+        if format not in MIME_TYPES:
+            raise ValueError(f"Unsupported image format {format!r}; expected one of {sorted(MIME_TYPES)}")
+        self.format = format
+        self.quality = quality
+        self.max_side = max_side
+
+    def resize(self, image):
+        import cv2
+        height, width = image.shape[:2]
+        scale = self.max_side / max(height, width) if self.max_side else 1.0
+        if scale >= 1.0:
+            return image
+        # INTER_AREA averages pixels when shrinking, avoiding the aliasing of nearest/linear
+        return cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    def encode(self, image):
+        """Encoded image file contents (a uint8 array) for a BGR frame."""
+        import cv2
+        params = {
+            'jpeg': [cv2.IMWRITE_JPEG_QUALITY, self.quality],
+            'webp': [cv2.IMWRITE_WEBP_QUALITY, self.quality],
+            'png': [cv2.IMWRITE_PNG_COMPRESSION, 3],  # Fast; higher levels barely shrink camera frames
+        }[self.format]
+        ok, buffer = cv2.imencode('.jpg' if self.format == 'jpeg' else f'.{self.format}', self.resize(image), params)
+        if not ok:
+            raise ValueError(f"Could not encode image as {self.format}")
+        return buffer
+
+    def data_url(self, image) -> str:
+        encoded = binascii.b2a_base64(self.encode(image), newline=False)
+        return f"data:{MIME_TYPES[self.format]};base64,{encoded.decode('ascii')}"
+
+_default_encoder = None
+
+def default_encoder() -> ImageEncoder:
+    global _default_encoder
+    if _default_encoder is None:
+        _default_encoder = ImageEncoder()
+    return _default_encoder
+
+def image_to_base64(image, encoder: Optional[ImageEncoder] = None) -> str:
+    """Encode an OpenCV (BGR) frame as base64, with the default encoder settings unless given others."""
+    return binascii.b2a_base64((encoder or default_encoder()).encode(image), newline=False).decode('ascii')
+
+def file_to_base64(path: str) -> str:
+    with open(path, 'rb') as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+def image_url(image: Image, encoder: Optional[ImageEncoder] = None) -> str:
+    """URL for an image_url message part: http(s) URLs pass through, everything else becomes a data URL.
+
+    Frames go through the encoder; bytes and files are sent as they are.
+    """
+    if hasattr(image, 'shape'):
+        return (encoder or default_encoder()).data_url(image)
+    if isinstance(image, bytes):
+        return f"data:image/png;base64,{base64.b64encode(image).decode('utf-8')}"
+    if image.startswith(('http://', 'https://', 'data:')):
+        return image
+    mime = mimetypes.guess_type(image)[0] or 'image/png'
+    return f"data:{mime};base64,{file_to_base64(image)}"
@@ -0,0 +1,226 @@
+import queue
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+from llama_vision.analyze import analyze_image
+
+STALL_MS = 100.0  # A loop iteration slower than this counts as a visible stall
+
+class InferenceResult(NamedTuple):
+    request_id: int
+    response: Optional[str]
+    error: Optional[Exception]
+    elapsed: float
+
+class InferenceWorker:
+    """Runs analyze_image on a background thread so a display loop never waits for the model.
+
+    At most one request runs at a time and at most one waits behind it. Submitting replaces the
+    waiting request, and any result from a request that has been superseded is dropped (a request
+    already on the wire cannot be recalled, but its answer is no longer shown). Finished results
+    are read without blocking through poll().
+    """
+
+    def __init__(self, **analyze_options):
+        self.analyze_options = analyze_options
+        self._pending = None  # (request_id, image, prompt) waiting to run
+        self._latest_id = 0
+        self._running_id = None
+        self._started_at = None
+        self._submitted_at = None
+        self._condition = threading.Condition()
+        self._results = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, image, prompt: str) -> int:
+        """Queue a request, superseding any earlier one; returns its id."""
+        with self._condition:
+            self._latest_id += 1
+            self._pending = (self._latest_id, image, prompt)
+            self._submitted_at = time.monotonic()
+            self._condition.notify()
+            return self._latest_id
+
+    def cancel(self):
+        """Drop the waiting request and ignore the result of the running one."""
+        with self._condition:
+            self._latest_id += 1
+            self._pending = None
+
+    @property
+    def busy(self) -> bool:
+        return self.in_flight_seconds is not None
+
+    @property
+    def in_flight_seconds(self) -> Optional[float]:
+        """Seconds since the newest request was submitted, or None when nothing is outstanding."""
+        with self._condition:
+            if self._pending is None and self._running_id != self._latest_id:
+                return None
+            return time.monotonic() - self._submitted_at
+
+    def poll(self) -> Optional[InferenceResult]:
+        """The newest finished result that has not been superseded, if any."""
+        result = None
+        while True:
+            try:
+                candidate = self._results.get_nowait()
+            except queue.Empty:
+                return result
+            if candidate.request_id == self._latest_id:
+                result = candidate
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                request_id, image, prompt = self._pending
+                self._pending = None
+                self._running_id, self._started_at = request_id, time.monotonic()
+            response, error = None, None
+            try:
+                response = analyze_image(image, prompt, **self.analyze_options)
+            except Exception as e:
+                error = e
+            with self._condition:
+                elapsed = time.monotonic() - self._started_at
+                self._running_id, self._started_at = None, None
+            self._results.put(InferenceResult(request_id, response, error, elapsed))
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+class FrameTimer:
+    """Per-iteration timing for a display loop: frame rate, worst frame and stalls over STALL_MS."""
+
+    def __init__(self, stall_ms: float = STALL_MS):
+        self.stall_ms = stall_ms
+        self.frames = 0
+        self.stalls = 0
+        self.total_ms = 0.0
+        self.worst_ms = 0.0
+        self.recent_worst_ms = 0.0  # Slowest frame in the last full second
+        self._recent_worst_ms = 0.0
+        self._window_start = time.perf_counter()
+        self._window_frames = 0
+        self._last = None
+        self.fps = 0.0
+
+    def tick(self):
+        """Call once per loop iteration."""
+        now = time.perf_counter()
+        if self._last is not None:
+            elapsed_ms = (now - self._last) * 1000
+            self.frames += 1
+            self.total_ms += elapsed_ms
+            self.worst_ms = max(self.worst_ms, elapsed_ms)
+            self._recent_worst_ms = max(self._recent_worst_ms, elapsed_ms)
+            if elapsed_ms > self.stall_ms:
+                self.stalls += 1
+        self._last = now
+        self._window_frames += 1
+        if now - self._window_start >= 1.0:
+            self.fps = self._window_frames / (now - self._window_start)
+            self.recent_worst_ms, self._recent_worst_ms = self._recent_worst_ms, 0.0
+            self._window_start, self._window_frames = now, 0
+
+    def summary(self) -> Dict:
+        return {
+            'frames': self.frames,
+            'mean_ms': round(self.total_ms / self.frames, 2) if self.frames else 0.0,
+            'worst_ms': round(self.worst_ms, 2),
+            'stalls': self.stalls,
+        }
+
+class InfoOverlay:
+    """Prompt/response panel drawn onto one preallocated canvas, redrawn only when its text changes.
+
+    The body (prompt and word-wrapped response) and the one-line footer (status, timings) are
+    separate regions with their own dirty flags, so a ticking status line does not re-rasterize
+    the response. render() returns False when nothing changed and the window can keep its image.
+    """
+
+    FONT = 0  # cv2.FONT_HERSHEY_SIMPLEX, without importing cv2 at module load
+    LINE_HEIGHT = 20
+    MARGIN = 10
+
+    def __init__(self, width: int = 1000, height: int = 240):
+        import numpy as np
+        self.width = width
+        self.height = height
+        self.canvas = np.zeros((height, width, 3), np.uint8)
+        self._body = None  # (prompt, response) last drawn
+        self._footer = None
+        self.renders = 0
+        self.render_ms = 0.0  # Total time spent drawing
+        self.last_render_ms = 0.0
+        self.body_render_ms = 0.0  # Cost of the last prompt/response redraw, the expensive part
+
+    def wrap(self, text: str, scale: float = 0.4) -> list:
+        """Split text into lines that fit the canvas width, breaking at spaces where possible."""
+        import cv2
+        max_width = self.width - 2 * self.MARGIN
+        lines = []
+        for paragraph in text.split('\n'):
+            line = ""
+            for word in paragraph.split(' '):
+                candidate = f"{line} {word}" if line else word
+                if line and cv2.getTextSize(candidate, self.FONT, scale, 1)[0][0] > max_width:
+                    lines.append(line)
+                    candidate = word
+                line = candidate
+            lines.append(line)
+        return lines
+
+    def _draw_body(self, prompt: str, response: str):
+        import cv2
+        body_bottom = self.height - self.LINE_HEIGHT - 5
+        self.canvas[:body_bottom] = 0
+        cv2.putText(self.canvas, f"Prompt: {prompt}", (self.MARGIN, 30), self.FONT, 0.5, (255, 255, 255), 1)
+        cv2.putText(self.canvas, "Response:", (self.MARGIN, 60), self.FONT, 0.5, (255, 255, 255), 1)
+        y = 90
+        lines = self.wrap(response)
+        for i, line in enumerate(lines):
+            if y + self.LINE_HEIGHT > body_bottom and i < len(lines) - 1:
+                cv2.putText(self.canvas, line + " ...", (self.MARGIN, y), self.FONT, 0.4, (255, 255, 255), 1)
+                break
+            cv2.putText(self.canvas, line, (self.MARGIN, y), self.FONT, 0.4, (255, 255, 255), 1)
+            y += self.LINE_HEIGHT
+
+    def _draw_footer(self, footer: str):
+        import cv2
+        self.canvas[self.height - self.LINE_HEIGHT - 5:] = 0
+        cv2.putText(self.canvas, footer, (self.MARGIN, self.height - 8), self.FONT, 0.4, (128, 128, 128), 1)
+
+    def render(self, prompt: str, response: str, footer: str = "") -> bool:
+        """Bring the canvas up to date; True when anything was redrawn."""
+        start = time.perf_counter()
+        changed = False
+        if self._body != (prompt, response):
+            self._draw_body(prompt, response)
+            self._body = (prompt, response)
+            self.body_render_ms = (time.perf_counter() - start) * 1000
+            changed = True
+        if self._footer != footer:
+            self._draw_footer(footer)
+            self._footer = footer
+            changed = True
+        if changed:
+            self.last_render_ms = (time.perf_counter() - start) * 1000
+            self.render_ms += self.last_render_ms
+            self.renders += 1
+        return changed
+
+    def summary(self) -> Dict:
+        return {
+            'renders': self.renders,
+            'mean_render_ms': round(self.render_ms / self.renders, 2) if self.renders else 0.0,
+        }
@@ -0,0 +1,107 @@
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds in a rate-limit reset header: a plain number or a Go-style duration such as '6m0s' or '20ms'."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PATTERN.findall(value)
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts) if parts else None
+
+def retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds the server asked us to wait, from retry-after-ms or retry-after (seconds or an HTTP date)."""
+    if headers.get('retry-after-ms'):
+        try:
+            return float(headers['retry-after-ms']) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 20.0) -> float:
+    """Exponential backoff with full jitter, so retrying callers spread out instead of stampeding."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+class TokenBucket:
+    """Request-rate limiter shared by sync and async callers.
+
+    reserve() takes a token immediately and returns how long the caller must wait before using it,
+    so waiting happens outside the lock with time.sleep or asyncio.sleep. The rate adapts: it halves
+    whenever the server throttles us, creeps back up on success, and is capped by what the
+    x-ratelimit-* response headers say is left in the current window.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, min_rate: float = 0.1,
+                 increase: float = 0.05):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.min_rate = min_rate
+        self.increase = increase  # Requests/s regained per successful response
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def throttled(self, pause: Optional[float] = None):
+        """The server answered 429: halve the rate and, if it said how long, hold every caller back that long."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate / 2)
+            if pause:
+                self._paused_until = max(self._paused_until, now + pause)
+
+    def succeeded(self, headers: Mapping[str, str]):
+        """Recover rate after a success, then respect whatever budget the headers report."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            rate = min(self.max_rate, self.rate + self.increase)
+            remaining = headers.get('x-ratelimit-remaining-requests')
+            reset = parse_duration(headers.get('x-ratelimit-reset-requests'))
+            if remaining is not None:
+                try:
+                    remaining = float(remaining)
+                except ValueError:
+                    remaining = None
+            if remaining is not None:
+                self._tokens = min(self._tokens, remaining)
+                if remaining < 1 and reset:
+                    # Window used up: wait for it to reset rather than trickling requests into 429s
+                    self._paused_until = max(self._paused_until, now + reset)
+                elif reset:
+                    # Spread what is left of the window over the time until it resets
+                    rate = min(rate, max(remaining / reset, self.min_rate))
+            self.rate = max(self.min_rate, rate)
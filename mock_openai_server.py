@@ -0,0 +1,88 @@
+import argparse
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for an OpenAI-compatible /chat/completions endpoint, for exercising the apps offline:
+#   python mock_openai_server.py --port 8001
+#   OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=test python data-aware-ai-assistant.py
+
+def last_user_text(messages) -> str:
+    """Text of the last user message, whether plain or multimodal content."""
+    for message in reversed(messages):
+        if message.get('role') != 'user':
+            continue
+        content = message.get('content')
+        if isinstance(content, list):
+            return " ".join(part.get('text', '') for part in content if part.get('type') == 'text')
+        return content or ""
+    return ""
+
+class MockHandler(BaseHTTPRequestHandler):
+    token_delay = 0.0
+    reply = None  # Fixed reply; echoes the question when unset
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        text = self.reply or f"You asked: {last_user_text(body.get('messages', []))}"
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get('model', 'mock')
+
+        if body.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            for i, token in enumerate(text.split(' ')):
+                delta = {'content': token if i == 0 else ' ' + token}
+                self._send_event({
+                    'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                    'model': model, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}],
+                })
+                time.sleep(self.token_delay)
+            self._send_event({
+                'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                'model': model, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+            })
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+
+        time.sleep(self.token_delay * len(text.split(' ')))
+        payload = json.dumps({
+            'id': completion_id, 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_event(self, data):
+        self.wfile.write(f"data: {json.dumps(data)}\n\n".encode())
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat completions server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--token-delay', type=float, default=0.05, help="Seconds between streamed tokens")
+    parser.add_argument('--reply', help="Fixed reply text (defaults to echoing the question)")
+    args = parser.parse_args()
+
+    MockHandler.token_delay = args.token_delay
+    MockHandler.reply = args.reply
+    server = ThreadingHTTPServer((args.host, args.port), MockHandler)
+    print(f"Mock OpenAI server listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
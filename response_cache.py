@@ -0,0 +1,92 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Sequence, Tuple
+
+# Configuration
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 1024))
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 24 * 3600))  # Seconds
+# Cosine similarity between TF-IDF query vectors needed for a fuzzy hit; unset disables fuzzy matching
+RESPONSE_CACHE_SIMILARITY = float(os.environ['RESPONSE_CACHE_SIMILARITY']) if os.getenv('RESPONSE_CACHE_SIMILARITY') else None
+
+def normalize_question(question: str) -> str:
+    """Lowercase and collapse punctuation/whitespace so trivially different phrasings share a key."""
+    return " ".join(re.findall(r'\w+', question.lower()))
+
+class ResponseCache:
+    """LRU/TTL cache of LLM answers keyed on the document, retrieved chunks, question and model settings.
+
+    Entries are grouped by scope (everything but the question), so a fuzzy lookup only compares the
+    query vector against questions answered from the same document, context and model.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL,
+                 similarity: Optional[float] = RESPONSE_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (answer, stored_at, query_vector)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(document: str, chunk_ids: Sequence[int], question: str, model: str, temperature: float) -> Tuple:
+        return document, tuple(chunk_ids), model, temperature, normalize_question(question)
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def get(self, key: Tuple, query_vector=None) -> Optional[str]:
+        """Return a cached answer for key, falling back to the most similar question in the same scope."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[1], now):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            if self.similarity is not None and query_vector is not None:
+                best_key, best_score = self._nearest(key[:-1], query_vector, now)
+                if best_key is not None and best_score >= self.similarity:
+                    self._entries.move_to_end(best_key)
+                    self.fuzzy_hits += 1
+                    return self._entries[best_key][0]
+
+            self.misses += 1
+            return None
+
+    def _nearest(self, scope: Hashable, query_vector, now: float):
+        best_key, best_score = None, -1.0
+        for candidate, (_, stored_at, vector) in self._entries.items():
+            if candidate[:-1] != scope or vector is None or self._expired(stored_at, now):
+                continue
+            # Both vectors are L2-normalized rows, so the dot product is the cosine similarity
+            score = float(query_vector.multiply(vector).sum())
+            if score > best_score:
+                best_key, best_score = candidate, score
+        return best_key, best_score
+
+    def put(self, key: Tuple, answer: str, query_vector=None):
+        with self._lock:
+            self._entries[key] = (answer, time.time(), query_vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.fuzzy_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'fuzzy_hits': self.fuzzy_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.fuzzy_hits) / lookups if lookups else 0.0,
+        }
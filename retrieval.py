@@ -0,0 +1,317 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+from typing import List, Optional, Tuple
+
+from embeddings import vector_scale
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Dense retrieval parameters
+IVF_MIN_ROWS = 4096  # Below this many chunks (or chunks in the searched documents) vectors are scanned exhaustively
+IVF_PROBES = 8  # Inverted lists scanned per query
+HYBRID_DEPTH = 50  # Candidates taken from each retriever before fusion
+RRF_K = 60  # Reciprocal rank fusion damping
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Return the indices of the top_k highest scores, best first."""
+    top_k = min(top_k, len(scores))
+    if top_k <= 0:
+        return np.empty(0, dtype=np.intp)
+    # argpartition is O(n); only the k survivors need a full sort
+    candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+def rows_in_ranges(rows: np.ndarray, ranges: np.ndarray) -> np.ndarray:
+    """Boolean mask of the rows falling inside any of the sorted, disjoint [start, end) ranges."""
+    if len(ranges) == 0:
+        return np.zeros(len(rows), dtype=bool)
+    position = np.searchsorted(ranges[:, 0], rows, side='right') - 1
+    return (position >= 0) & (rows < ranges[np.maximum(position, 0), 1])
+
+class StackedVectors:
+    """Per-segment vector arrays addressed as one (rows, dim) matrix without concatenating them.
+
+    Segments loaded from the index store hold memory-mapped vectors; gathering only the rows a
+    search needs keeps the rest on disk instead of copying every vector into RAM.
+    """
+
+    def __init__(self, parts):
+        self.parts = list(parts)
+        self.starts = np.cumsum([0] + [len(part) for part in self.parts])
+        self.dtype = self.parts[0].dtype if self.parts else np.dtype(np.float16)
+        self.dim = self.parts[0].shape[1] if self.parts else 0
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        """(len(rows), dim) copy of the given rows."""
+        rows = np.asarray(rows, dtype=np.intp)
+        part_of = np.searchsorted(self.starts, rows, side='right') - 1
+        taken = np.empty((len(rows), self.dim), dtype=self.dtype)
+        for part in np.unique(part_of):
+            mask = part_of == part
+            taken[mask] = self.parts[part][rows[mask] - self.starts[part]]
+        return taken
+
+    def blocks(self, size: int):
+        """Consecutive slices of at most size rows, in row order."""
+        for part in self.parts:
+            for start in range(0, len(part), size):
+                yield part[start:start + size]
+
+class Retriever:
+    """Ranks a corpus's chunks against a query.
+
+    Built by the corpus from the stacked raw term counts of all its chunks (one row per chunk),
+    plus their stored embeddings when every document has them, and rebuilt after documents are
+    added or removed. search returns (rows, scores), best first, optionally restricted to row ranges.
+    """
+
+    def __init__(self, corpus, counts: sp.csr_matrix, vectors: Optional[StackedVectors] = None):
+        self.corpus = corpus
+
+    def search(self, query: str, top_k: int, ranges: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+    @property
+    def nbytes(self) -> int:
+        return 0
+
+class TfidfRetriever(Retriever):
+    """Cosine similarity against L2-normalized TF-IDF rows, scoring every chunk per query."""
+
+    def __init__(self, corpus, counts: sp.csr_matrix, vectors: Optional[StackedVectors] = None):
+        super().__init__(corpus, counts)
+        matrix = counts.astype(np.float64)
+        idf, _ = corpus.idf(matrix.indices)
+        matrix.data *= idf
+        self.matrix = normalize(matrix, norm='l2', copy=False)
+
+    def search(self, query: str, top_k: int, ranges: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        scores = (self.matrix @ self.corpus.query_vector(query).T).toarray().ravel()
+        if ranges is not None:
+            scores[~rows_in_ranges(np.arange(len(scores)), ranges)] = -np.inf
+        rows = top_k_indices(scores, top_k)
+        rows = rows[np.isfinite(scores[rows])]
+        return rows, scores[rows]
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.data.nbytes + self.matrix.indices.nbytes + self.matrix.indptr.nbytes
+
+class BM25Retriever(Retriever):
+    """Okapi BM25 over an inverted index, with max-score pruning of the top-k search.
+
+    Posting lists are slices of two flat arrays (chunk rows, precomputed BM25 impacts), so a query
+    only touches the postings of its own terms. Terms are visited in decreasing order of their best
+    possible contribution; once the unvisited terms together cannot lift an unseen chunk into the
+    top k, the remaining lists are only probed, by binary search, for the surviving candidates.
+    """
+
+    def __init__(self, corpus, counts: sp.csr_matrix, vectors: Optional[StackedVectors] = None,
+                 k1: float = BM25_K1, b: float = BM25_B):
+        super().__init__(corpus, counts)
+        n_chunks = counts.shape[0]
+        lengths = np.asarray(counts.sum(axis=1)).ravel()
+        average_length = lengths.mean() if n_chunks and lengths.any() else 1.0
+
+        postings = counts.tocsc()
+        postings.sum_duplicates()
+        postings.sort_indices()
+        df = np.diff(postings.indptr)
+        self.term_ids = np.flatnonzero(df)  # Only terms that occur get a posting list
+        self.term_starts = postings.indptr[self.term_ids].astype(np.int64)
+        self.term_ends = postings.indptr[self.term_ids + 1].astype(np.int64)
+        self.rows = postings.indices.astype(np.int32)
+
+        term_df = df[self.term_ids]
+        idf = np.log(1 + (n_chunks - term_df + 0.5) / (term_df + 0.5))
+        tf = postings.data.astype(np.float64)
+        impacts = np.repeat(idf, term_df) * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[self.rows] / average_length))
+        self.impacts = impacts.astype(np.float32)
+        self.upper_bounds = np.maximum.reduceat(self.impacts, self.term_starts) if len(self.term_ids) else np.empty(0, np.float32)
+
+    def _lookup(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Posting-list positions of the query's known terms, and how often each occurs in the query."""
+        counts = self.corpus.vectorizer.transform([query]).tocsr()
+        counts.sum_duplicates()
+        if not len(self.term_ids):
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        positions = np.minimum(np.searchsorted(self.term_ids, counts.indices), len(self.term_ids) - 1)
+        known = self.term_ids[positions] == counts.indices
+        return positions[known], counts.data[known]
+
+    def search(self, query: str, top_k: int, ranges: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        positions, query_tf = self._lookup(query)
+        bounds = self.upper_bounds[positions] * query_tf
+        remaining = float(bounds.sum())
+        rows = np.empty(0, dtype=np.int32)
+        scores = np.empty(0)
+        threshold = 0.0
+
+        for i in np.argsort(-bounds, kind='stable'):
+            start, end = self.term_starts[positions[i]], self.term_ends[positions[i]]
+            term_rows = self.rows[start:end]
+            term_impacts = self.impacts[start:end] * query_tf[i]
+
+            if len(rows) >= top_k and remaining <= threshold:
+                # No unseen chunk can reach the top k any more: drop hopeless candidates, probe the rest
+                keep = scores + remaining >= threshold
+                rows, scores = rows[keep], scores[keep]
+                hit = np.searchsorted(term_rows, rows)
+                found = hit < len(term_rows)
+                found[found] = term_rows[hit[found]] == rows[found]
+                scores[found] += term_impacts[hit[found]]
+            else:
+                if ranges is not None:
+                    allowed = rows_in_ranges(term_rows, ranges)
+                    term_rows, term_impacts = term_rows[allowed], term_impacts[allowed]
+                merged, inverse = np.unique(np.concatenate([rows, term_rows]), return_inverse=True)
+                scores = np.bincount(inverse, weights=np.concatenate([scores, term_impacts]), minlength=len(merged))
+                rows = merged.astype(np.int32)
+
+            remaining -= bounds[i]
+            if len(scores) >= top_k > 0:
+                threshold = float(np.partition(scores, len(scores) - top_k)[len(scores) - top_k])
+
+        best = top_k_indices(scores, top_k)
+        return rows[best].astype(np.intp), scores[best]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (
+            self.term_ids, self.term_starts, self.term_ends, self.rows, self.impacts, self.upper_bounds
+        ))
+
+def range_rows(ranges: np.ndarray) -> np.ndarray:
+    """All rows covered by [start, end) ranges, in order."""
+    if len(ranges) == 0:
+        return np.empty(0, dtype=np.intp)
+    return np.concatenate([np.arange(start, end) for start, end in ranges])
+
+class IvfIndex:
+    """Inverted-file ANN index: spherical k-means lists, of which only the nearest few are scanned.
+
+    The index holds the row numbers of each list, not the vectors, which are read from their
+    segments for the probed lists only.
+    """
+
+    def __init__(self, vectors: StackedVectors, n_probe: int = IVF_PROBES, iterations: int = 10,
+                 batch: int = 65536, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        n_lists = max(1, int(np.sqrt(len(vectors))))
+        sample = vectors.take(np.sort(rng.choice(len(vectors), min(len(vectors), 32 * n_lists), replace=False)))
+        sample = sample.astype(np.float32)
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        assignment = np.concatenate([
+            np.argmax(block.astype(np.float32) @ centroids.T, axis=1) for block in vectors.blocks(batch)
+        ])
+        order = np.argsort(assignment, kind='stable')
+        self.centroids = centroids
+        self.list_starts = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+        self.rows = order.astype(np.int32)  # Row numbers, grouped by list
+        self.vectors = vectors
+        self.n_probe = n_probe
+
+    def search(self, query: np.ndarray, top_k: int, ranges: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Best top_k rows among the nearest lists; with ranges, only rows inside them count.
+
+        A filtered search keeps probing lists, nearest first, past n_probe until top_k allowed rows
+        have turned up (in the worst case every list, i.e. an exact scan of the allowed rows).
+        """
+        lists = np.argsort(-(self.centroids @ query), kind='stable')
+        found, count, probed = [], 0, 0
+        while probed < len(lists):
+            batch = lists[probed:probed + self.n_probe]
+            probed += len(batch)
+            rows = np.concatenate([self.rows[self.list_starts[i]:self.list_starts[i + 1]] for i in batch])
+            if ranges is not None:
+                rows = rows[rows_in_ranges(rows, ranges)]
+            found.append(rows)
+            count += len(rows)
+            if ranges is None or count >= top_k:
+                break
+        rows = np.concatenate(found).astype(np.intp)
+        scores = self.vectors.take(rows).astype(np.float32) @ query
+        best = top_k_indices(scores, top_k)
+        return rows[best], scores[best]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (self.centroids, self.list_starts, self.rows))
+
+class DenseRetriever(Retriever):
+    """Cosine similarity between the embedded query and each chunk's stored embedding.
+
+    Large corpora are searched through an IVF index; small ones, and searches restricted to a few
+    small documents, scan the vectors directly. The vectors stay in their segments.
+    """
+
+    def __init__(self, corpus, counts: sp.csr_matrix, vectors: Optional[StackedVectors] = None):
+        super().__init__(corpus, counts)
+        if vectors is None and counts.shape[0]:
+            raise ValueError("Dense retrieval needs every document indexed with an embedder")
+        self.vectors = vectors
+        self.index = IvfIndex(vectors) if vectors is not None and len(vectors) >= IVF_MIN_ROWS else None
+
+    def search(self, query: str, top_k: int, ranges: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        if self.vectors is None or len(self.vectors) == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        query_vector = self.corpus.embedder.embed([query])[0]
+        scale = vector_scale(self.vectors)
+
+        rows = range_rows(ranges) if ranges is not None else None
+        if self.index is not None and (rows is None or len(rows) >= IVF_MIN_ROWS):
+            rows, scores = self.index.search(query_vector, top_k, ranges)
+            return rows, scores / scale
+        if rows is None:
+            rows = np.arange(len(self.vectors))
+        scores = self.vectors.take(rows).astype(np.float32) @ query_vector
+        best = top_k_indices(scores, top_k)
+        return rows[best], scores[best] / scale
+
+    @property
+    def nbytes(self) -> int:
+        # The vectors themselves belong to the segments
+        return self.index.nbytes if self.index is not None else 0
+
+def fuse_rankings(ranked: List[np.ndarray], top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Reciprocal rank fusion of several best-first row lists: (rows, scores) of the top_k, best first."""
+    rows, inverse = np.unique(np.concatenate(ranked), return_inverse=True)
+    weights = np.concatenate([1.0 / (RRF_K + 1 + np.arange(len(found))) for found in ranked])
+    scores = np.bincount(inverse, weights=weights, minlength=len(rows))
+    best = top_k_indices(scores, top_k)
+    return rows[best].astype(np.intp), scores[best]
+
+class HybridRetriever(Retriever):
+    """BM25 and dense results merged with reciprocal rank fusion, which needs no score calibration."""
+
+    def __init__(self, corpus, counts: sp.csr_matrix, vectors: Optional[StackedVectors] = None):
+        super().__init__(corpus, counts)
+        self.sparse = BM25Retriever(corpus, counts)
+        self.dense = DenseRetriever(corpus, counts, vectors)
+
+    def search(self, query: str, top_k: int, ranges: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        depth = max(top_k, HYBRID_DEPTH)
+        return fuse_rankings([retriever.search(query, depth, ranges)[0] for retriever in (self.sparse, self.dense)], top_k)
+
+    @property
+    def nbytes(self) -> int:
+        return self.sparse.nbytes + self.dense.nbytes
+
+RETRIEVERS = {
+    'tfidf': TfidfRetriever,
+    'bm25': BM25Retriever,
+    'dense': DenseRetriever,
+    'hybrid': HybridRetriever,
+}
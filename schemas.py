@@ -0,0 +1,20 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+# Structured-output models for the vision scripts, importable without running them
+# (e.g. batch_analyze.py --schema schemas:FinancialChartAnalysis)
+
+class FinancialChartAnalysis(BaseModel):
+    chart_title: str = Field(..., description="What is the title of the chart?")
+    key_findings: List[str] = Field(..., description="Key findings from the chart analysis.")
+    insights: str = Field(..., description="Overall insights and interpretation of the chart.")
+
+class CookBook(BaseModel):
+    recipe_name: str = Field(..., description="The name of the recipe.")
+    ingredients: List[str] = Field(..., description="The ingredients of the recipe.")
+    instructions: str = Field(..., description="The instructions of the recipe.")
+
+class Model(BaseModel):
+    model_name: str = Field(..., description="What is this model called?")
+    model_use: str = Field(..., description="What is this deep learning architecture used for?")
+    movie_working: str = Field(..., description="How does this model work?")
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from corpus import Corpus, Segment
+
+# Configuration
+MAX_SESSIONS = int(os.getenv('MAX_SESSIONS', 500))
+SESSION_IDLE_TIMEOUT = float(os.getenv('SESSION_IDLE_TIMEOUT', 2 * 3600))  # Seconds
+SESSION_MEMORY_LIMIT = int(os.getenv('SESSION_MEMORY_LIMIT', 2 * 1024 ** 3))  # Bytes of resident indexes
+
+class SessionRegistry:
+    """Per-session document corpora, with one shared in-memory copy of each distinct document.
+
+    Sessions are kept in least-recently-used order. Idle sessions are dropped after
+    idle_timeout, and the oldest ones are dropped whenever there are more than max_sessions
+    or resident memory exceeds max_bytes. A document is freed once no session uses it.
+    """
+
+    def __init__(self, corpus_factory: Callable[[], Corpus], max_sessions: int = MAX_SESSIONS,
+                 idle_timeout: float = SESSION_IDLE_TIMEOUT, max_bytes: int = SESSION_MEMORY_LIMIT):
+        self.corpus_factory = corpus_factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()  # session id -> (corpus, last used)
+        self._documents = {}  # document key -> [segment, session count]
+        self._lock = threading.Lock()
+
+    def document(self, key: str) -> Optional[Segment]:
+        """Return the resident segment for a document key, if any session already loaded it."""
+        with self._lock:
+            entry = self._documents.get(key)
+            return entry[0] if entry else None
+
+    def add(self, session_id: str, segment: Segment, name: Optional[str] = None,
+            replaces: Optional[str] = None) -> Segment:
+        """Add a document to a session's corpus, reusing the resident copy if another session got there first.
+
+        replaces names a document (such as a partial index of the same upload) to drop in the same step.
+        The corpus's retriever is rebuilt on the calling thread, after the registry lock is released.
+        """
+        with self._lock:
+            corpus = self._touch(session_id)
+            if replaces is not None and corpus.remove(replaces) is not None:
+                self._decref(replaces)
+            entry = self._documents.get(segment.key)
+            if entry is None:
+                entry = self._documents[segment.key] = [segment, 0]
+            if segment.key not in corpus:
+                corpus.add(entry[0], name)
+                entry[1] += 1
+            self._evict(keep=session_id)
+        corpus.refresh()
+        return entry[0]
+
+    def remove(self, session_id: str, key: str):
+        """Drop one document from a session's corpus."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session[0].remove(key) is None:
+                return
+            self._decref(key)
+        session[0].refresh()
+
+    def get(self, session_id: str) -> Optional[Corpus]:
+        """Return the session's corpus and mark the session as recently used."""
+        with self._lock:
+            if session_id not in self._sessions:
+                return None
+            return self._touch(session_id)
+
+    def release(self, session_id: str):
+        """Forget a session, e.g. when its browser tab closes."""
+        with self._lock:
+            self._detach(session_id)
+
+    def _touch(self, session_id: str) -> Corpus:
+        session = self._sessions.get(session_id)
+        corpus = session[0] if session is not None else self.corpus_factory()
+        self._sessions[session_id] = (corpus, time.monotonic())
+        self._sessions.move_to_end(session_id)
+        return corpus
+
+    def _decref(self, key: str):
+        entry = self._documents[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._documents[key]
+
+    def _detach(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return
+        for key in list(session[0].segments):
+            self._decref(key)
+
+    def _evict(self, keep: str):
+        now = time.monotonic()
+        for session_id, (_, last_used) in list(self._sessions.items()):
+            if session_id != keep and now - last_used > self.idle_timeout:
+                self._detach(session_id)
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or self.memory_usage() > self.max_bytes):
+            oldest = next(iter(self._sessions))
+            if oldest == keep:
+                break
+            self._detach(oldest)
+
+    def memory_usage(self) -> int:
+        """Approximate resident bytes: shared documents counted once, plus each session's corpus state."""
+        documents = sum(entry[0].nbytes for entry in self._documents.values())
+        return documents + sum(corpus.nbytes for corpus, _ in self._sessions.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'documents': len(self._documents),
+                'bytes': self.memory_usage(),
+            }
@@ -0,0 +1,167 @@
+import json
+import re
+import warnings
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional, Union
+
+from ingest import iter_frames
+
+TABLE_EXAMPLE_VALUES = 3  # Distinct values shown per column when describing a table to the LLM
+CATEGORY_MAX_RATIO = 0.5  # Text columns with fewer distinct values than this share of rows become categoricals
+
+class Filter(BaseModel):
+    column: str
+    op: Literal['==', '!=', '>', '>=', '<', '<=', 'contains']
+    value: Union[float, str]
+
+class TableQuery(BaseModel):
+    """One aggregate over a table, as chosen by the LLM; run_query does the arithmetic."""
+    table: str = Field(..., description="Name of the table to query")
+    operation: Literal['sum', 'mean', 'median', 'min', 'max', 'count', 'nunique', 'rows']
+    column: Optional[str] = Field(None, description="Column to aggregate or sort by; optional for count")
+    group_by: Optional[str] = None
+    time_grain: Optional[Literal['day', 'week', 'month', 'quarter', 'year']] = None
+    filters: List[Filter] = []
+    order: Literal['desc', 'asc'] = 'desc'
+    limit: int = 10
+
+def load_table(path: str) -> pd.DataFrame:
+    """Read a whole spreadsheet as a typed DataFrame: dates parsed, numbers numeric, repeated text categorical."""
+    frames = list(iter_frames(path))
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    df = df.dropna(how='all', axis=1).dropna(how='all', axis=0).reset_index(drop=True)
+    df.columns = [str(col) for col in df.columns]
+    for col in df.columns:
+        # Text arrives as object columns, or as the string dtype with pandas' string inference on
+        if not (pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col])):
+            continue
+        values = df[col].dropna()
+        if values.empty:
+            continue
+        numbers = pd.to_numeric(values, errors='coerce')
+        if numbers.notna().all():
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+            continue
+        if values.map(type).eq(str).all():
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')  # pandas warns when it has to guess the date format
+                dates = pd.to_datetime(df[col], errors='coerce')
+            if dates.notna().sum() > 0.9 * len(values):
+                df[col] = dates
+                continue
+        if values.nunique() < CATEGORY_MAX_RATIO * len(values):
+            df[col] = df[col].astype('category')
+    column_summary(df)  # Scanned here, off the chat event loop, rather than on every question
+    return df
+
+def column_summary(df: pd.DataFrame) -> List[str]:
+    """One line per column: name, type and a few example values or the range.
+
+    Scanning every column is slow on large tables, so the lines are computed once and kept in the
+    table's attrs (tables are not modified after load_table).
+    """
+    lines = df.attrs.get('column_summary')
+    if lines is None:
+        lines = []
+        for col in df.columns:
+            series = df[col]
+            if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+                detail = f"from {series.min()} to {series.max()}"
+            else:
+                examples = series.dropna().unique()[:TABLE_EXAMPLE_VALUES]
+                detail = "e.g. " + ", ".join(str(value) for value in examples)
+            lines.append(f"- {col} ({series.dtype}): {detail}")
+        df.attrs['column_summary'] = lines
+    return lines
+
+def describe_table(name: str, df: pd.DataFrame) -> str:
+    """Schema summary for the planning prompt: columns, types and a few example values or ranges."""
+    return "\n".join([f'Table "{name}" ({len(df)} rows):'] + column_summary(df))
+
+def plan_prompt(question: str, tables: Dict[str, pd.DataFrame]) -> str:
+    schemas = "\n\n".join(describe_table(name, df) for name, df in tables.items())
+    return f"""{schemas}
+
+Question: {question}
+
+If the question needs a total, average, count, minimum, maximum, ranking or similar computation over
+these tables, reply with only a JSON object with these fields:
+{json.dumps(TableQuery.model_json_schema()['properties'])}
+Use time_grain to group a date column by period (e.g. "which month had the best sales").
+Use operation "rows" to list matching rows sorted by column.
+If the question cannot be answered by such a computation, reply with {{"operation": "none"}}."""
+
+def parse_plan(text: str) -> Optional[TableQuery]:
+    """The TableQuery in an LLM reply, or None when it declined or the reply is not a valid plan."""
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if match is None:
+        return None
+    try:
+        data = json.loads(match.group(0))
+        if data.get('operation') in (None, 'none'):
+            return None
+        return TableQuery(**data)
+    except (ValueError, TypeError):
+        return None
+
+def _column(df: pd.DataFrame, name: Optional[str]) -> pd.Series:
+    if name not in df.columns:
+        raise ValueError(f"Unknown column {name!r}")
+    return df[name]
+
+def _filter_mask(df: pd.DataFrame, filters: List[Filter]) -> np.ndarray:
+    mask = np.ones(len(df), dtype=bool)
+    for f in filters:
+        series = _column(df, f.column)
+        value = f.value
+        if f.op == 'contains':
+            mask &= series.astype(str).str.contains(str(value), case=False, regex=False).to_numpy()
+            continue
+        if pd.api.types.is_datetime64_any_dtype(series):
+            value = pd.Timestamp(value)
+        elif pd.api.types.is_numeric_dtype(series):
+            value = float(value)
+        elif f.op in ('==', '!='):
+            # Text comparisons ignore case, as questions rarely match the data's capitalization
+            series, value = series.astype(str).str.lower(), str(value).lower()
+        mask &= {
+            '==': series == value, '!=': series != value,
+            '>': series > value, '>=': series >= value,
+            '<': series < value, '<=': series <= value,
+        }[f.op].to_numpy(dtype=bool, na_value=False)
+    return mask
+
+def run_query(df: pd.DataFrame, query: TableQuery) -> pd.DataFrame:
+    """Run a TableQuery as vectorized pandas operations over the whole table."""
+    df = df[_filter_mask(df, query.filters)]
+    ascending = query.order == 'asc'
+
+    if query.operation == 'rows':
+        if query.column is not None:
+            _column(df, query.column)
+            df = df.sort_values(query.column, ascending=ascending)
+        return df.head(query.limit)
+
+    values = _column(df, query.column) if query.column is not None else None
+    if values is None and query.operation != 'count':
+        raise ValueError(f"Operation {query.operation!r} needs a column")
+    if values is not None and query.operation in ('sum', 'mean', 'median') and not pd.api.types.is_numeric_dtype(values):
+        raise ValueError(f"Column {query.column!r} is not numeric")
+
+    if query.group_by is None:
+        result = len(df) if values is None and query.operation == 'count' else values.agg(query.operation)
+        return pd.DataFrame({f"{query.operation}({query.column or 'rows'})": [result]})
+
+    keys = _column(df, query.group_by)
+    if query.time_grain is not None and pd.api.types.is_datetime64_any_dtype(keys):
+        keys = keys.dt.to_period({'day': 'D', 'week': 'W', 'month': 'M', 'quarter': 'Q', 'year': 'Y'}[query.time_grain])
+    grouped = (values if values is not None else pd.Series(1, index=df.index)).groupby(keys, observed=True)
+    result = grouped.size() if values is None else grouped.agg(query.operation)
+    result = result.sort_values(ascending=ascending).head(query.limit)
+    return result.rename(f"{query.operation}({query.column or 'rows'})").reset_index()
+
+def format_result(query: TableQuery, result: pd.DataFrame) -> str:
+    """Result table plus the operation that produced it, for the answer prompt."""
+    return f"Computed with {query.model_dump_json(exclude_defaults=True)}:\n{result.to_string(index=False)}"
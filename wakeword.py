@@ -0,0 +1,237 @@
+import glob
+import os
+import wave
+from collections import deque
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+# Configuration
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 400  # 25 ms analysis window
+HOP_LENGTH = 160  # 10 ms between feature frames
+N_FFT = 512
+N_MELS = 26
+N_MFCC = 13
+PRE_EMPHASIS = 0.97
+# DTW distance at or below which a window matches a template; unset derives it from the templates
+WAKE_THRESHOLD = float(os.environ['WAKE_THRESHOLD']) if os.getenv('WAKE_THRESHOLD') else None
+DEFAULT_THRESHOLD = 0.2  # Used with a single template, where there is nothing to derive from
+THRESHOLD_MARGIN = 1.5  # Derived threshold: mean distance between the templates times this
+WAKE_GATE_DB = float(os.getenv('WAKE_GATE_DB', 10))  # Only match when the audio is this far above the noise floor
+CHECK_EVERY = 5  # Feature frames (50 ms) between template matches
+TRIM_DB = 30.0  # Template frames this far below the loudest one are trimmed as silence
+REFRACTORY_SECONDS = 1.0  # No second trigger this soon after one
+PREROLL_SECONDS = 2.0  # Audio kept for handing over after a trigger
+
+def template_paths(directory: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(directory, '*.wav')))
+
+def to_samples(chunk) -> np.ndarray:
+    """Float32 samples in [-1, 1] from 16-bit PCM bytes or a sample array."""
+    if isinstance(chunk, (bytes, bytearray)):
+        return np.frombuffer(chunk, dtype='<i2').astype(np.float32) / 32768.0
+    return np.asarray(chunk, dtype=np.float32)
+
+def read_wav(path: str) -> np.ndarray:
+    """Mono float32 samples of a 16-bit PCM WAV file, resampled to SAMPLE_RATE."""
+    with wave.open(path, 'rb') as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        rate, channels = f.getframerate(), f.getnchannels()
+        samples = to_samples(f.readframes(f.getnframes()))
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE and len(samples):
+        # Linear interpolation is plenty for 26 mel bands up to 8 kHz
+        positions = np.arange(0, len(samples) - 1, rate / SAMPLE_RATE)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return samples
+
+def mel_filterbank() -> np.ndarray:
+    """(N_MELS, N_FFT // 2 + 1) triangular filters evenly spaced on the mel scale."""
+    def to_mel(hz):
+        return 2595 * np.log10(1 + hz / 700)
+    mels = np.linspace(to_mel(0), to_mel(SAMPLE_RATE / 2), N_MELS + 2)
+    bins = np.floor((N_FFT + 1) * 700 * (10 ** (mels / 2595) - 1) / SAMPLE_RATE).astype(int)
+    filters = np.zeros((N_MELS, N_FFT // 2 + 1), dtype=np.float32)
+    for i in range(N_MELS):
+        left, center, right = bins[i], bins[i + 1], bins[i + 2]
+        filters[i, left:center] = (np.arange(left, center) - left) / max(center - left, 1)
+        filters[i, center:right] = (right - np.arange(center, right)) / max(right - center, 1)
+    return filters
+
+def dct_matrix() -> np.ndarray:
+    """(N_MFCC, N_MELS) orthonormal DCT-II."""
+    n = np.arange(N_MELS)
+    matrix = np.cos(np.pi / N_MELS * (n[None, :] + 0.5) * np.arange(N_MFCC)[:, None]) * np.sqrt(2 / N_MELS)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+class MfccExtractor:
+    """Streaming MFCCs: feed chunks of any size, get the feature frames they complete.
+
+    Leftover samples and the pre-emphasis state carry over between chunks, so the frames match
+    those of the whole signal processed at once.
+    """
+
+    def __init__(self):
+        self.window = np.hamming(FRAME_LENGTH).astype(np.float32)
+        self.filters = mel_filterbank()
+        self.dct = dct_matrix()
+        self.reset()
+
+    def reset(self):
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._last_sample = 0.0
+
+    def process(self, samples: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(features (frames, N_MFCC), log energies in dB (frames,)) for the frames completed by samples."""
+        if len(samples):
+            emphasized = samples - PRE_EMPHASIS * np.concatenate(([self._last_sample], samples[:-1]))
+            self._last_sample = float(samples[-1])
+            self._pending = np.concatenate((self._pending, emphasized.astype(np.float32)))
+        count = 1 + (len(self._pending) - FRAME_LENGTH) // HOP_LENGTH if len(self._pending) >= FRAME_LENGTH else 0
+        if count == 0:
+            return np.zeros((0, N_MFCC), dtype=np.float32), np.zeros(0, dtype=np.float32)
+        starts = np.arange(count) * HOP_LENGTH
+        frames = self._pending[starts[:, None] + np.arange(FRAME_LENGTH)] * self.window
+        self._pending = self._pending[count * HOP_LENGTH:]
+        power = np.abs(np.fft.rfft(frames, N_FFT)) ** 2 / N_FFT
+        energies = 10 * np.log10(power.sum(axis=1) + 1e-10)
+        mfcc = np.log(power @ self.filters.T + 1e-10) @ self.dct.T
+        return mfcc.astype(np.float32), energies.astype(np.float32)
+
+def normalize(features: np.ndarray) -> np.ndarray:
+    """Drop c0 (overall loudness) and scale each frame to unit length, so frame distance is cosine."""
+    shape = features[:, 1:]
+    return shape / (np.linalg.norm(shape, axis=1, keepdims=True) + 1e-8)
+
+def trim(features: np.ndarray, energies: np.ndarray) -> np.ndarray:
+    """Cut leading and trailing frames more than TRIM_DB below the loudest one."""
+    loud = np.flatnonzero(energies >= energies.max() - TRIM_DB) if len(energies) else []
+    return features[loud[0]:loud[-1] + 1] if len(loud) else features
+
+def dtw_distance(template: np.ndarray, window: np.ndarray) -> float:
+    """Length-normalized cost of the best alignment of template to any stretch of window.
+
+    Both are normalized feature frames. Steps are limited to (1,1), (1,2) and (2,1), so each
+    template row depends only on the two rows before it and is computed as one vector operation.
+    A (2,1) step also pays for the template row it passes over, so every alignment sums exactly one
+    cost per template row and dividing by the row count gives the mean frame distance.
+    """
+    cost = 1.0 - template @ window.T  # (template frames, window frames)
+    rows, cols = cost.shape
+    previous, before = cost[0].copy(), np.full(cols, np.inf, dtype=cost.dtype)  # Free start anywhere in the window
+    for i in range(1, rows):
+        best = np.full(cols, np.inf, dtype=cost.dtype)
+        best[1:] = previous[:-1]
+        best[2:] = np.minimum(best[2:], previous[:-2])
+        best[1:] = np.minimum(best[1:], before[:-1] + cost[i - 1][1:])  # Via row i - 1, in the landing column
+        previous, before = cost[i] + best, previous
+    return float(previous.min()) / rows  # Free end anywhere in the window
+
+def template_features(samples: np.ndarray) -> np.ndarray:
+    features, energies = MfccExtractor().process(samples)
+    return normalize(trim(features, energies))
+
+class WakeWordDetector:
+    """Streaming wake-word spotting by DTW template matching over MFCC features, fully offline.
+
+    Audio is fed in small chunks; every CHECK_EVERY feature frames the most recent window is
+    aligned against each recorded template of the wake word. Matching only runs while the audio is
+    WAKE_GATE_DB above the noise floor measured by calibrate(), which is called once at startup,
+    so silence costs just the feature extraction. The last PREROLL_SECONDS of audio are kept for
+    callers that want to pass the triggering utterance on.
+    """
+
+    def __init__(self, templates: Sequence[np.ndarray], threshold: Optional[float] = WAKE_THRESHOLD):
+        if not templates:
+            raise ValueError("At least one wake-word template is needed")
+        self.templates = list(templates)
+        self.threshold = threshold if threshold is not None else self.derive_threshold()
+        self.min_frames = min(len(t) for t in self.templates)
+        # Room for an utterance up to twice as slow as the longest template (the steepest DTW slope), between checks
+        window_frames = 2 * max(len(t) for t in self.templates) + CHECK_EVERY
+        self.extractor = MfccExtractor()
+        self.noise_db = None
+        self._features = deque(maxlen=window_frames)
+        self._energies = deque(maxlen=window_frames)
+        self._audio = deque()
+        self.checks = 0
+        self.gated = 0
+        self.triggers = 0
+        self.reset()
+
+    @classmethod
+    def from_wavs(cls, paths: Sequence[str], threshold: Optional[float] = WAKE_THRESHOLD) -> "WakeWordDetector":
+        return cls([template_features(read_wav(path)) for path in paths], threshold)
+
+    @classmethod
+    def from_directory(cls, directory: str, threshold: Optional[float] = WAKE_THRESHOLD) -> "WakeWordDetector":
+        return cls.from_wavs(template_paths(directory), threshold)
+
+    def derive_threshold(self) -> float:
+        """THRESHOLD_MARGIN times the mean distance between templates, i.e. how much real utterances vary."""
+        distances = [dtw_distance(a, b) for i, a in enumerate(self.templates)
+                     for j, b in enumerate(self.templates) if i != j and len(b) * 2 >= len(a)]
+        return float(np.mean(distances)) * THRESHOLD_MARGIN if distances else DEFAULT_THRESHOLD
+
+    def calibrate(self, chunk):
+        """Measure the noise floor from a second or so of ambient audio."""
+        _, energies = MfccExtractor().process(to_samples(chunk))
+        if len(energies):
+            self.noise_db = float(np.median(energies))
+
+    def reset(self):
+        """Forget buffered audio between streams (keeps templates, threshold and calibration)."""
+        self.extractor.reset()
+        self._features.clear()
+        self._energies.clear()
+        self._audio.clear()
+        self._audio_length = 0
+        self._since_check = 0
+        self._cooldown = 0
+        self.best_score = float('inf')  # Lowest distance seen since reset, for tuning the threshold
+
+    def _remember(self, samples: np.ndarray):
+        self._audio.append(samples)
+        self._audio_length += len(samples)
+        while self._audio_length - len(self._audio[0]) >= PREROLL_SECONDS * SAMPLE_RATE:
+            self._audio_length -= len(self._audio.popleft())
+
+    def preroll(self) -> np.ndarray:
+        """The most recent PREROLL_SECONDS of audio, ending with the trigger."""
+        return np.concatenate(self._audio) if self._audio else np.zeros(0, dtype=np.float32)
+
+    def process(self, chunk) -> bool:
+        """Feed a chunk of 16-bit PCM bytes or float samples; True when the wake word was just heard."""
+        samples = to_samples(chunk)
+        self._remember(samples)
+        features, energies = self.extractor.process(samples)
+        triggered = False
+        for frame, energy in zip(normalize(features), energies):
+            self._features.append(frame)
+            self._energies.append(energy)
+            if self._cooldown:
+                self._cooldown -= 1
+                continue
+            self._since_check += 1
+            if self._since_check >= CHECK_EVERY and len(self._features) >= self.min_frames:
+                self._since_check = 0
+                if self._match():
+                    triggered = True
+                    self.triggers += 1
+                    self._cooldown = int(REFRACTORY_SECONDS * SAMPLE_RATE / HOP_LENGTH)
+                    self._features.clear()
+                    self._energies.clear()
+        return triggered
+
+    def _match(self) -> bool:
+        if self.noise_db is not None and max(self._energies) < self.noise_db + WAKE_GATE_DB:
+            self.gated += 1
+            return False
+        self.checks += 1
+        window = np.array(self._features)
+        score = min(dtw_distance(template, window) for template in self.templates)
+        self.best_score = min(self.best_score, score)
+        return score <= self.threshold